@@ -0,0 +1,479 @@
+"""
+Benchmarks for Kanayo SportyGrab.
+Run with: python bench.py [--suite micro|replay|all] [--output bench.json] [--compare previous.json]
+
+The replay suite never touches Sportybet or Nitter: a local fixture server replays upcoming pages,
+the upcoming JSON feed, the code hub and Nitter search results, with optional latency and failure injection.
+Recorded responses can be dropped into a directory passed with --fixtures; anything missing is generated.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import resource
+import statistics
+import string
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import dateutil.parser
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from main import (
+    TWEET_MAX_AGE, UPCOMING_SPORTS, Broadcaster, BrowserPool, CodeExtractor, NitterClient, Quota, SportybetApi,
+    SportybetScraper, parse_nitter_dates, parse_nitter_timeline,
+)
+
+
+def legacy_extract(text):
+    """The pre-CodeExtractor approach: findall, two character scans per candidate, and a regex per odds format"""
+    found = re.findall(r'\b([A-Z0-9]{6})\b', text.upper())
+    valid = []
+    for c in found:
+        if any(char.isdigit() for char in c) and any(char.isalpha() for char in c):
+            if c not in ['SPORTY', 'BETGER', 'UPCOMI', 'VIRTUA', 'FOOTBA', 'BASKET']:
+                valid.append(c)
+    results = []
+    for code in set(valid):
+        pos = text.upper().find(code)
+        context = text[max(0, pos - 300):pos + 300]
+        odds = None
+        for pattern in [r'odds?:\s*([\d,]+\.?\d*)', r'([\d,]+\.?\d*)\s*odds?', r'@\s*([\d,]+\.?\d*)', r'([\d,]+\.?\d*)[xX]']:
+            odds_match = re.search(pattern, context, re.IGNORECASE)
+            if odds_match:
+                try:
+                    odds = float(odds_match.group(1).replace(',', ''))
+                    break
+                except ValueError:
+                    continue
+        results.append((code, pos, odds))
+    return results
+
+
+def legacy_timeline(html, minutes=45):
+    """The pre-batch Twitter path: BeautifulSoup tree, per-tweet finds and a dateutil parse per date"""
+    soup = BeautifulSoup(html, 'html.parser')
+    now = datetime.now(timezone.utc)
+    texts = []
+    for tweet in soup.find_all('div', class_='timeline-item'):
+        link = tweet.find('span', class_='tweet-date').find('a')
+        posted = dateutil.parser.parse(link.get('title', '').replace('·', ' '))
+        if posted.tzinfo is None:
+            posted = posted.replace(tzinfo=timezone.utc)
+        if now - posted <= timedelta(minutes=minutes):
+            texts.append(tweet.find('div', class_='tweet-content').get_text())
+    return texts
+
+
+def batch_timeline(html):
+    titles, texts = parse_nitter_timeline(html, limit=None)
+    posted = parse_nitter_dates(titles)
+    recent = (posted.isna() | (pd.Timestamp.now(tz="UTC") - posted <= TWEET_MAX_AGE)).to_numpy()
+    return [text for text, keep in zip(texts, recent) if keep]
+
+
+def random_code(rng):
+    return "".join(rng.choice(string.ascii_uppercase) for _ in range(3)) + "".join(rng.choice(string.digits) for _ in range(3))
+
+
+def make_blob(size, seed=7):
+    """Hub/tweet-like filler text with a booking code and odds value sprinkled in every few lines"""
+    rng = random.Random(seed)
+    words = ["sportybet", "booking", "code", "football", "basketball", "upcoming", "league", "draw", "win", "today"]
+    formats = ["Odds: {:,}", "@ {}", "{}x", "{} odds", "10000x"]
+    lines = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choice(words) for _ in range(12))
+        if rng.random() < 0.3:
+            line += f" {random_code(rng)} " + rng.choice(formats).format(rng.randint(2, 50000))
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def nitter_title(moment):
+    return f"{moment:%b} {moment.day}, {moment.year} · {moment.hour % 12 or 12}:{moment:%M %p} UTC"
+
+
+# ---------------------------------------------------------------- fixtures
+
+class Fixtures:
+    """Response bodies for the fixture server, loaded from a recordings directory or generated"""
+
+    def __init__(self, directory=None, events=300, cards=40, tweets=50):
+        self.directory = directory
+        self.events = events
+        self.cards = cards
+        self.tweets = tweets
+
+    def recorded(self, name):
+        if self.directory:
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    return f.read()
+        return None
+
+    def upcoming_events(self, sport):
+        rng = random.Random(f"{sport}-events")
+        outcomes = 3 if sport == "football" else 2
+        return [{
+            "eventId": f"sr:match:{i}",
+            "homeTeamName": f"{sport.title()} Home {i}",
+            "awayTeamName": f"{sport.title()} Away {i}",
+            "markets": [{
+                "id": UPCOMING_SPORTS[sport]["market_id"],
+                "outcomes": [{"odds": f"{rng.uniform(1.05, 12):.2f}"} for _ in range(outcomes)],
+            }],
+        } for i in range(self.events)]
+
+    def upcoming_json(self, sport, page_num, page_size):
+        recorded = self.recorded(f"upcoming_{sport}.json")
+        if recorded:
+            return recorded
+        events = self.upcoming_events(sport)
+        page = events[(page_num - 1) * page_size:page_num * page_size]
+        return json.dumps({"bizCode": 10000, "data": {"totalNum": len(events), "tournaments": [{"name": "Fixture League", "events": page}]}})
+
+    def upcoming_html(self, sport):
+        recorded = self.recorded(f"upcoming_{sport}.html")
+        if recorded:
+            return recorded
+        rows = "".join(
+            '<div class="m-table-row"><div class="teams">'
+            f'<div class="home-team">{e["homeTeamName"]}</div><div class="away-team">{e["awayTeamName"]}</div></div>'
+            + "".join(f'<div class="m-outcome"><span class="m-outcome-odds">{o["odds"]}</span></div>' for o in e["markets"][0]["outcomes"])
+            + '</div>'
+            for e in self.upcoming_events(sport)
+        )
+        return f"<html><body><div class='m-table'>{rows}</div></body></html>"
+
+    def code_hub_html(self):
+        recorded = self.recorded("code_hub.html")
+        if recorded:
+            return recorded
+        rng = random.Random("hub")
+        cards = "".join(
+            '<div class="item-wrap"><div class="card-outer"><div class="code-card">'
+            f'<div class="code">{random_code(rng)}</div><div class="sport">Basketball</div>'
+            f'<div class="odds">Odds: {rng.randint(200, 9000):,}</div><span class="time">{rng.randint(1, 40)} mins ago</span>'
+            '</div></div></div>'
+            for _ in range(self.cards)
+        )
+        return f"<html><body><div class='list-item'>{cards}</div></body></html>"
+
+    def nitter_html(self):
+        recorded = self.recorded("nitter.html")
+        if recorded:
+            return recorded
+        rng = random.Random("nitter")
+        now = datetime.now(timezone.utc)
+        items = "".join(
+            '<div class="timeline-item">'
+            f'<span class="tweet-date"><a title="{nitter_title(now - timedelta(minutes=rng.randint(0, 90)))}">1m</a></span>'
+            f'<div class="tweet-content">Sportybet booking code {random_code(rng)} {rng.choice(["@ ", "Odds: "])}{rng.randint(200, 9000)} basketball</div>'
+            '</div>'
+            for _ in range(self.tweets)
+        )
+        return f"<html><body><div class='timeline'>{items}</div></body></html>"
+
+
+class FixtureServer:
+    """Threaded local HTTP server replaying fixtures with injected latency and failures"""
+
+    def __init__(self, fixtures, latency=0.0, failure_rate=0.0, dead_nitter=0, seed=3):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.dead_nitter = dead_nitter
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, path, query):
+        """(status, content type, body) for a request"""
+        if path == "/api/ng/factsCenter/pcUpcomingEvents":
+            sport = "basketball" if query.get("sportId", [""])[0] == "sr:sport:2" else "football"
+            page_num = int(query.get("pageNum", ["1"])[0])
+            page_size = int(query.get("pageSize", ["100"])[0])
+            return 200, "application/json", self.fixtures.upcoming_json(sport, page_num, page_size)
+        match = re.fullmatch(r"/ng/sport/(football|basketball)/upcoming", path)
+        if match:
+            return 200, "text/html", self.fixtures.upcoming_html(match.group(1))
+        if path == "/ng/m/code-hub/codes":
+            return 200, "text/html", self.fixtures.code_hub_html()
+        match = re.fullmatch(r"/nitter/(\d+)/search", path)
+        if match:
+            if int(match.group(1)) < self.dead_nitter:
+                return 503, "text/plain", "instance down"
+            return 200, "text/html", self.fixtures.nitter_html()
+        return 404, "text/plain", "not found"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                if server.failure_rate and server.rng.random() < server.failure_rate:
+                    status, content_type, body = 500, "text/plain", "injected failure"
+                else:
+                    status, content_type, body = server.respond(parsed.path, parse_qs(parsed.query))
+                payload = body.encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Hedged Nitter requests are cancelled once another instance answers
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# ---------------------------------------------------------------- measurement
+
+class CountingBroadcaster(Broadcaster):
+    """Counts published records instead of sending them anywhere"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = 0
+
+    def publish(self, message):
+        if message["type"] in ("result", "booking_code"):
+            self.records += 1
+        super().publish(message)
+
+
+def memory_kb():
+    """(current, peak) RSS in KB from /proc; elsewhere both are ru_maxrss, the process-wide high-water mark"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["VmHWM"].split()[0])
+    except (OSError, KeyError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes elsewhere
+        peak = peak // 1024 if platform.system() == "Darwin" else peak
+        return peak, peak
+
+
+def start_case():
+    """Resets the kernel's peak-RSS mark (Linux) and returns the RSS a case's growth is measured from"""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        # No reset: growth is then how far the case pushed the process-wide peak
+        return memory_kb()[1]
+    return memory_kb()[0]
+
+
+def summarize(name, runs, rss_before):
+    walls = [run["wall_s"] for run in runs]
+    records = runs[-1]["records"]
+    median_wall = statistics.median(walls)
+    return {
+        "name": name,
+        "runs": len(runs),
+        "wall_s_min": round(min(walls), 4),
+        "wall_s_median": round(median_wall, 4),
+        "cpu_s_median": round(statistics.median(run["cpu_s"] for run in runs), 4),
+        "records": records,
+        "records_per_s": round(records / median_wall, 2) if median_wall else None,
+        "rss_growth_kb": max(0, memory_kb()[1] - rss_before),
+    }
+
+
+def bench_micro(sizes, repeat):
+    results = []
+    extractor = CodeExtractor()
+    for size in sizes:
+        blob = make_blob(size)
+        for name, fn in (("extract_legacy", legacy_extract), ("extract_6char_codes", extractor.codes), ("extract_with_odds", extractor.extract)):
+            runs = []
+            rss_before = start_case()
+            for _ in range(repeat):
+                cpu, started = time.process_time(), time.perf_counter()
+                found = fn(blob)
+                runs.append({"wall_s": time.perf_counter() - started, "cpu_s": time.process_time() - cpu, "records": len(found)})
+            results.append(summarize(f"{name}[{size}]", runs, rss_before))
+
+    scraper = SportybetScraper(broadcaster=CountingBroadcaster())
+    now = datetime.now(timezone.utc)
+    titles = [nitter_title(now - timedelta(minutes=m)) for m in range(0, 600, 3)] * 50
+    runs = []
+    rss_before = start_case()
+    for _ in range(repeat):
+        cpu, started = time.process_time(), time.perf_counter()
+        for title in titles:
+            scraper.is_recent(title)
+        runs.append({"wall_s": time.perf_counter() - started, "cpu_s": time.process_time() - cpu, "records": len(titles)})
+    results.append(summarize(f"is_recent[{len(titles)}]", runs, rss_before))
+
+    for tweets in (50, 500):
+        html = Fixtures(tweets=tweets).nitter_html()
+        for name, fn in (("timeline_legacy", legacy_timeline), ("timeline_batch", batch_timeline)):
+            runs = []
+            rss_before = start_case()
+            for _ in range(repeat):
+                cpu, started = time.process_time(), time.perf_counter()
+                kept = fn(html)
+                runs.append({"wall_s": time.perf_counter() - started, "cpu_s": time.process_time() - cpu, "records": len(kept)})
+            results.append(summarize(f"{name}[{tweets}]", runs, rss_before))
+    return results
+
+
+async def bench_replay(args):
+    fixtures = Fixtures(args.fixtures, events=args.events, cards=args.cards, tweets=args.tweets)
+    results = []
+    with FixtureServer(fixtures, latency=args.latency_ms / 1000, failure_rate=args.failure_rate, dead_nitter=args.dead_nitter) as server:
+        pool = BrowserPool()
+        nitter = NitterClient([f"{server.url}/nitter/{i}" for i in range(5)])
+        api = SportybetApi(server.url)
+
+        def make_scraper(fast_path):
+            # No dashboard pacing between codes, so the timings measure the scrape itself
+            scraper = SportybetScraper(pool, nitter=nitter, broadcaster=CountingBroadcaster(), api=api if fast_path else None,
+                                       code_delay=0)
+            scraper.url_football = f"{server.url}/ng/sport/football/upcoming"
+            scraper.url_basketball = f"{server.url}/ng/sport/basketball/upcoming"
+            scraper.url_code_hub = f"{server.url}/ng/m/code-hub/codes"
+            return scraper
+
+        cases = [
+            ("scrape_football[json]", True, lambda s: s.scrape_football()),
+            ("scrape_basketball[json]", True, lambda s: s.scrape_basketball()),
+            ("scrape_twitter", True, lambda s: s.scrape_twitter("basketball", 1000, Quota(10))),
+            ("scrape_football[browser]", False, lambda s: s.scrape_football()),
+            ("scrape_basketball[browser]", False, lambda s: s.scrape_basketball()),
+            ("scrape_official_hub", True, lambda s: s.scrape_official_hub("basketball", 1000, Quota(10))),
+            ("scrape_booking_codes", True, lambda s: s.scrape_booking_codes("basketball", 1000)),
+        ]
+        browser_error = None
+        for name, fast_path, run in cases:
+            uses_browser = "browser" in name or name in ("scrape_official_hub", "scrape_booking_codes")
+            if uses_browser and browser_error is None:
+                try:
+                    await pool.start()
+                except Exception as e:
+                    browser_error = str(e).splitlines()[0]
+            if uses_browser and browser_error:
+                if name != "scrape_booking_codes":
+                    results.append({"name": name, "skipped": browser_error})
+                    print(f"{name:<32} skipped: {browser_error}")
+                    continue
+                # Twitter only, with the hub failing: different work, so it must not be compared with the full case
+                name = "scrape_booking_codes[no-hub]"
+            runs = []
+            rss_before = start_case()
+            for _ in range(args.repeat):
+                scraper = make_scraper(fast_path)
+                cpu, started = time.process_time(), time.perf_counter()
+                await run(scraper)
+                runs.append({"wall_s": time.perf_counter() - started, "cpu_s": time.process_time() - cpu, "records": scraper.broadcaster.records})
+                await scraper.store.close()
+            results.append(summarize(name, runs, rss_before))
+            print_result(results[-1])
+
+        await nitter.close()
+        await api.close()
+        await pool.close()
+        print(f"fixture server handled {server.requests} requests")
+    return results
+
+
+def print_result(result):
+    if "skipped" in result:
+        print(f"{result['name']:<32} skipped: {result['skipped']}")
+        return
+    print(f"{result['name']:<32} wall {result['wall_s_median'] * 1000:9.2f} ms  cpu {result['cpu_s_median'] * 1000:9.2f} ms"
+          f"  records {result['records']:>6}  {result['records_per_s'] or 0:>10.1f}/s  rss +{result['rss_growth_kb'] / 1024:.1f} MB")
+
+
+def compare(results, previous_path, threshold):
+    """Prints benchmarks whose median wall time regressed by more than threshold against a previous run"""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {r["name"]: r for r in json.load(f)["results"] if "wall_s_median" in r}
+    regressions = 0
+    for result in results:
+        before = previous.get(result["name"])
+        if not before or "wall_s_median" not in result or not before["wall_s_median"]:
+            continue
+        change = result["wall_s_median"] / before["wall_s_median"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        regressions += bool(flag)
+        print(f"{result['name']:<32} {change:+8.1%} {flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=["micro", "replay", "all"], default="all")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", help="directory with recorded upcoming_<sport>.json/.html, code_hub.html, nitter.html")
+    parser.add_argument("--events", type=int, default=300, help="generated upcoming events per sport")
+    parser.add_argument("--cards", type=int, default=40, help="generated code-hub cards")
+    parser.add_argument("--tweets", type=int, default=50, help="generated Nitter timeline items")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every fixture response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fixture responses turned into HTTP 500")
+    parser.add_argument("--dead-nitter", type=int, default=0, help="number of Nitter instances that always fail")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="previous --output file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    results = []
+    if args.suite in ("micro", "all"):
+        for result in bench_micro(args.sizes, args.repeat):
+            print_result(result)
+            results.append(result)
+    if args.suite in ("replay", "all"):
+        results.extend(asyncio.run(bench_replay(args)))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": vars(args),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        raise SystemExit(1 if compare(results, args.compare, args.threshold) else 0)
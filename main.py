@@ -3,280 +3,1910 @@ Sportybet Real-Time Scraper Dashboard
 I Call it Kanayo SportyGrab. 
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 import asyncio
+import bisect
+import csv
+import functools
+import io
+import itertools
 import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
 import re
-from playwright.async_api import async_playwright
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from datetime import datetime, timedelta, timezone
-from typing import List
-import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from typing import Optional
+import httpx
 import dateutil.parser
+import numpy as np
+import pandas as pd
+import openpyxl
 
-app = FastAPI()
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
 
-active_connections: List[WebSocket] = []
 
-class SportybetScraper:
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if worker_tier:
+        await worker_tier.start()
+    else:
+        try:
+            await browser_pool.start()
+        except Exception as e:
+            # Chromium may be missing at boot; jobs retry the launch on demand
+            logger.warning("Browser pool warm-up failed: %s", e)
+    await store.start()
+    await scheduler.start()
+    yield
+    await scheduler.stop()
+    if worker_tier:
+        await worker_tier.stop()
+    await broadcaster.close()
+    await scraper.seen.save()
+    await scraper.nitter.close()
+    if scraper.api:
+        await scraper.api.close()
+    await browser_pool.close()
+    await store.close()
+
+app = FastAPI(lifespan=lifespan)
+
+
+class Metrics:
+    """Minimal Prometheus registry: counters, gauges and fixed-bucket histograms, rendered as text on demand"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
     def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.gauges = {}
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * len(self.BUCKETS), 0.0, 0]
+        # Per-bucket counts; render() makes them cumulative
+        index = bisect.bisect_left(self.BUCKETS, value)
+        if index < len(self.BUCKETS):
+            histogram[0][index] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def drain(self):
+        """Returns and resets counters and histograms, for shipping from a worker process to the API process"""
+        data = {"counters": dict(self.counters), "histograms": self.histograms}
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        return data
+
+    def merge(self, data):
+        for key, value in data["counters"].items():
+            self.counters[key] += value
+        for key, (buckets, total, count) in data["histograms"].items():
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.BUCKETS), 0.0, 0]
+            histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+            histogram[1] += total
+            histogram[2] += count
+
+    def gauge(self, name, read, text=None):
+        """Registers a gauge whose value is read from `read()` (a number or {labels tuple: number}) at render time"""
+        self.gauges[name] = read
+        if text:
+            self.describe(name, text)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    @staticmethod
+    def _number(value):
+        # Full precision: `:g` keeps 6 significant digits, so big counters would stall and jump under rate()
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+
+    def _header(self, lines, name, kind):
+        if name in self.help:
+            lines.append(f"# HELP {name} {self.help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def render(self):
+        lines = []
+        for kind, series in (("counter", self.counters), ("histogram", self.histograms)):
+            by_name = defaultdict(list)
+            for (name, labels), value in list(series.items()):
+                by_name[name].append((labels, value))
+            for name in sorted(by_name):
+                self._header(lines, name, kind)
+                for labels, value in sorted(by_name[name]):
+                    if kind == "counter":
+                        lines.append(f"{name}{self._labels(labels)} {self._number(value)}")
+                        continue
+                    buckets, total, count = value
+                    cumulative = 0
+                    for bound, hits in zip(self.BUCKETS, buckets):
+                        cumulative += hits
+                        lines.append(f"{name}_bucket{self._labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total:.6f}")
+                    lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for name in sorted(self.gauges):
+            self._header(lines, name, "gauge")
+            value = self.gauges[name]()
+            if isinstance(value, dict):
+                for labels, v in sorted(value.items()):
+                    lines.append(f"{name}{self._labels(labels)} {self._number(v)}")
+            else:
+                lines.append(f"{name} {self._number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("sportygrab_stage_seconds", "Time spent in each scrape stage")
+metrics.describe("sportygrab_job_seconds", "Scrape job duration by source")
+metrics.describe("sportygrab_jobs_total", "Finished scrape jobs by source and status")
+metrics.describe("sportygrab_rows_parsed_total", "Upcoming listing rows parsed")
+metrics.describe("sportygrab_odds_events_total", "Odds snapshot events emitted")
+metrics.describe("sportygrab_codes_found_total", "Booking codes accepted")
+metrics.describe("sportygrab_codes_rejected_total", "Booking codes rejected")
+metrics.describe("sportygrab_nitter_failures_total", "Failed Nitter requests by instance")
+metrics.describe("sportygrab_ws_dropped_messages_total", "Messages dropped for slow WebSocket clients")
+metrics.describe("sportygrab_browser_restarts_total", "Chromium relaunches after a failed health check")
+
+# Context profiles handed out by the browser pool
+BROWSER_PROFILES = {
+    "desktop": {},
+    "mobile": {
+        "viewport": {'width': 375, 'height': 812},
+        "user_agent": 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15'
+    },
+}
+
+# Per-sport settings for the upcoming listings; the URL lives on the scraper as url_<sport>
+UPCOMING_SPORTS = {
+    "football": {"label": "Football", "market": "1X2", "min_outcomes": 3, "sport_id": "sr:sport:1", "market_id": "1"},
+    "basketball": {"label": "Basketball", "market": "1X2", "min_outcomes": 1, "sport_id": "sr:sport:2", "market_id": "219"},
+}
+
+# Runs in the page: [rows scanned, [[home, away, [odds...]], ...]] for a slice of the listing rows
+UPCOMING_ROWS_JS = """
+([offset, limit]) => {
+    const slice = Array.from(document.querySelectorAll('.m-table-row')).slice(offset, offset + limit);
+    return [slice.length, slice.flatMap(row => {
+        const home = row.querySelector('.teams .home-team');
+        const away = row.querySelector('.teams .away-team');
+        if (!home || !away) return [];
+        const odds = Array.from(row.querySelectorAll('.m-outcome-odds'), cell => cell.innerText.trim());
+        return [[home.innerText.trim(), away.innerText.trim(), odds]];
+    })];
+}
+"""
+
+# Runs in the page: reveals more rows, via the next-page control if there is one, otherwise by scrolling
+# lazy-loaded sections into view. Returns "page" or "scroll" so the caller knows what to wait for.
+UPCOMING_MORE_JS = """
+() => {
+    const next = document.querySelector('.pagination .next:not(.disabled), .m-pagination .next:not(.disabled)');
+    if (next) {
+        const first = document.querySelector('.m-table-row');
+        window.__sportygrabFirstRow = first ? first.innerText : '';
+        next.click();
+        return 'page';
+    }
+    window.scrollTo(0, document.body.scrollHeight);
+    return 'scroll';
+}
+"""
+HUB_CARD_SELECTOR = 'div[class*="code"], div[class*="card"], div[class*="item"]'
+HUB_SPORT_PATTERN = re.compile(r'\b(football|basketball|tennis)\b', re.IGNORECASE)
+
+# In-page text tests. textContent runs adjacent elements' text together ("ABC123Basketball"), so the
+# tests run on it are boundary-free supersets of the strict ones applied to a card's innerText
+HUB_TEXT_TESTS_JS = r"""
+    const looseCodeRe = /(?=[A-Z]{0,5}\d)(?=\d{0,5}[A-Z])[A-Z0-9]{6}/i;
+    const looseOddsRe = /odds?\s*:|@\s*\d|\dx|\d\s*odds?/i;
+    const loose = (node) => {
+        const text = node.textContent || '';
+        return looseCodeRe.test(text) && looseOddsRe.test(text);
+    };
+"""
+
+# Hub readiness: some matched element holds code- and odds-like text, not just the app shell
+HUB_READY_JS = "(selector) => {" + HUB_TEXT_TESTS_JS + """
+    for (const node of document.querySelectorAll(selector)) {
+        if (loose(node)) return true;
+    }
+    return false;
+}"""
+
+# Runs in the page: keeps only the innermost matched elements that hold a code and an odds value,
+# drops repeated text, and returns one [text, posted] pair per card. Only those survivors pay for innerText
+HUB_CARDS_JS = "(selector) => {" + HUB_TEXT_TESTS_JS + r"""
+    const codeRe = /\b(?=[A-Z]{0,5}\d)(?=\d{0,5}[A-Z])[A-Z0-9]{6}\b/i;
+    const oddsRe = /odds?\s*:|@\s*\d|\dx|\d\s*odds?\b/i;
+    const postedRe = /\b\d+\s*(?:s|sec|secs|m|min|mins|minutes?|h|hrs?|hours?)\s+ago\b|\bjust now\b/i;
+    const candidates = new Set();
+    for (const node of document.querySelectorAll(selector)) {
+        if (loose(node)) candidates.add(node);
+    }
+    const outer = new Set();
+    for (const node of candidates) {
+        for (let parent = node.parentElement; parent && !outer.has(parent); parent = parent.parentElement) {
+            if (candidates.has(parent)) outer.add(parent);
+        }
+    }
+    const seen = new Set();
+    const cards = [];
+    for (const node of candidates) {
+        if (outer.has(node)) continue;
+        const text = (node.innerText || '').trim();
+        if (!codeRe.test(text) || !oddsRe.test(text) || seen.has(text)) continue;
+        seen.add(text);
+        const timeEl = node.querySelector('time, [class*="time"], [class*="date"]');
+        const posted = timeEl ? (timeEl.getAttribute('datetime') || timeEl.textContent.trim()) : ((text.match(postedRe) || [null])[0]);
+        cards.push([text, posted]);
+    }
+    return cards;
+}"""
+
+# Requests we never read from; aborted by the pool's request routing
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+BLOCKED_URL_PARTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "facebook.net", "hotjar.com", "connect.facebook", "clarity.ms",
+)
+
+
+class BrowserPool:
+    """Warm Chromium shared by every scrape job, lending out reusable browser contexts"""
+
+    def __init__(self, max_contexts=4, max_pages_per_context=25, block_resources=True):
+        self.max_contexts = max_contexts
+        self.max_pages_per_context = max_pages_per_context
+        self.block_resources = block_resources
+        self.launch_args = ['--disable-blink-features=AutomationControlled']
+        self._playwright = None
+        self._browser = None
+        self._idle = {profile: [] for profile in BROWSER_PROFILES}
+        self._busy = 0
+        self._slots = asyncio.Semaphore(max_contexts)
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "browser_launches": 0,
+            "launch_seconds_total": 0.0,
+            "contexts_created": 0,
+            "contexts_recycled": 0,
+            "pages_served": 0,
+            "queued_acquires": 0,
+            "queue_wait_seconds_total": 0.0,
+            "health_check_failures": 0,
+            "requests_blocked": 0,
+        }
+        self.ready_times = deque(maxlen=50)
+
+    async def start(self):
+        async with self._lock:
+            await self._ensure_browser()
+
+    async def close(self):
+        async with self._lock:
+            for idle in self._idle.values():
+                for entry in idle:
+                    await self._close_context(entry)
+                idle.clear()
+            if self._browser:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+            if self._playwright:
+                await self._playwright.stop()
+            self._browser = None
+            self._playwright = None
+
+    async def _ensure_browser(self):
+        """Health check: relaunch Chromium if it was never started or has died"""
+        if self._browser and self._browser.is_connected():
+            return
+        if self._browser:
+            self.stats["health_check_failures"] += 1
+            metrics.inc("sportygrab_browser_restarts_total")
+            for idle in self._idle.values():
+                idle.clear()
+        if not self._playwright:
+            self._playwright = await async_playwright().start()
+        started = time.perf_counter()
+        self._browser = await self._playwright.chromium.launch(headless=True, args=self.launch_args)
+        elapsed = time.perf_counter() - started
+        self.stats["browser_launches"] += 1
+        self.stats["launch_seconds_total"] += elapsed
+        metrics.observe("sportygrab_stage_seconds", elapsed, stage="browser_launch")
+
+    async def _close_context(self, entry):
+        try:
+            await entry["context"].close()
+        except Exception:
+            pass
+
+    async def _checkout(self, profile):
+        async with self._lock:
+            await self._ensure_browser()
+            self._busy += 1
+            if self._idle[profile]:
+                return self._idle[profile].pop()
+            # Stay within max_contexts by retiring an idle context of another profile
+            if self._busy + sum(len(idle) for idle in self._idle.values()) > self.max_contexts:
+                for idle in self._idle.values():
+                    if idle:
+                        await self._close_context(idle.pop(0))
+                        break
+            try:
+                context = await self._browser.new_context(**BROWSER_PROFILES[profile])
+                if self.block_resources:
+                    await context.route("**/*", self._filter_request)
+            except Exception:
+                self._busy -= 1
+                raise
+            self.stats["contexts_created"] += 1
+            return {"context": context, "browser": self._browser, "pages": 0}
+
+    async def _checkin(self, profile, entry, page):
+        if page:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        async with self._lock:
+            self._busy -= 1
+            stale = entry["browser"] is not self._browser or not entry["browser"].is_connected()
+            if stale or entry["pages"] >= self.max_pages_per_context:
+                self.stats["contexts_recycled"] += 1
+                await self._close_context(entry)
+            else:
+                self._idle[profile].append(entry)
+
+    async def _filter_request(self, route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or any(part in request.url for part in BLOCKED_URL_PARTS):
+            self.stats["requests_blocked"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def load(self, page, url, ready_selector=None, timeout=10000, ready_function=None, ready_arg=None):
+        """Navigates and waits until ready_function(ready_arg) is truthy, ready_selector appears, or the network
+        is idle (in that order of preference); returns seconds to ready"""
+        started = time.perf_counter()
+        with metrics.timer("sportygrab_stage_seconds", stage="page_goto"):
+            await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+        ready = True
+        try:
+            if ready_function:
+                await page.wait_for_function(ready_function, arg=ready_arg, timeout=timeout, polling=100)
+            elif ready_selector:
+                await page.wait_for_selector(ready_selector, timeout=timeout)
+            else:
+                await page.wait_for_load_state("networkidle", timeout=timeout)
+        except PlaywrightTimeoutError:
+            # Scrape whatever rendered, same as the old fixed sleep would have
+            ready = False
+        elapsed = time.perf_counter() - started
+        self.ready_times.append({"url": url, "seconds": round(elapsed, 3), "ready": ready})
+        metrics.observe("sportygrab_stage_seconds", elapsed, stage="page_ready")
+        return elapsed
+
+    @asynccontextmanager
+    async def page(self, profile="desktop"):
+        """Borrow a fresh page, queueing until a context is free"""
+        if self._slots.locked():
+            self.stats["queued_acquires"] += 1
+        waited = time.perf_counter()
+        async with self._slots:
+            self.stats["queue_wait_seconds_total"] += time.perf_counter() - waited
+            metrics.observe("sportygrab_stage_seconds", time.perf_counter() - waited, stage="pool_wait")
+            entry = await self._checkout(profile)
+            page = None
+            try:
+                page = await entry["context"].new_page()
+                entry["pages"] += 1
+                self.stats["pages_served"] += 1
+                yield page
+            finally:
+                await self._checkin(profile, entry, page)
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        launches = stats["browser_launches"]
+        avg_launch = stats["launch_seconds_total"] / launches if launches else 0.0
+        stats["avg_launch_seconds"] = round(avg_launch, 3)
+        # Every page beyond the launches we paid for would have cost a cold launch before pooling
+        stats["launch_seconds_saved"] = round(max(stats["pages_served"] - launches, 0) * avg_launch, 3)
+        stats["contexts_busy"] = self._busy
+        stats["contexts_idle"] = {profile: len(idle) for profile, idle in self._idle.items()}
+        stats["browser_connected"] = bool(self._browser and self._browser.is_connected())
+        stats["recent_ready_times"] = list(self.ready_times)
+        return stats
+
+
+NITTER_INSTANCES = [
+    "https://nitter.net",
+    "https://nitter.poast.org",
+    "https://nitter.privacydev.net",
+    "https://nitter.unixfox.eu",
+    "https://nitter.1d4.us"
+]
+
+
+class SportybetApi:
+    """Browserless reader for the upcoming-events JSON the Sportybet frontend loads"""
+
+    def __init__(self, base_url="https://www.sportybet.com", timeout=10.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+                    'Accept': 'application/json',
+                },
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def upcoming_page(self, sport, page_num=1, page_size=100):
+        """One page of the upcoming feed as (rows, total events, events on this page); raises on HTTP or API errors"""
+        config = UPCOMING_SPORTS[sport]
+        with metrics.timer("sportygrab_stage_seconds", stage="api_fetch"):
+            response = await self._get_client().get(f"{self.base_url}/api/ng/factsCenter/pcUpcomingEvents", params={
+                "sportId": config["sport_id"],
+                "marketId": config["market_id"],
+                "pageSize": page_size,
+                "pageNum": page_num,
+                "timeline": 24,
+                "_t": int(time.time() * 1000),
+            })
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("bizCode") != 10000:
+            raise ValueError(f"Sportybet API error: {payload.get('message')}")
+        data = payload.get("data") or {}
+        rows = []
+        events = 0
+        for tournament in data.get("tournaments") or []:
+            for event in tournament.get("events") or []:
+                events += 1
+                market = next((m for m in event.get("markets") or [] if str(m.get("id")) == config["market_id"]), None)
+                if not market:
+                    continue
+                rows.append({
+                    "home": event["homeTeamName"],
+                    "away": event["awayTeamName"],
+                    "odds": [outcome["odds"] for outcome in market.get("outcomes") or []],
+                })
+        return rows, data.get("totalNum", events), events
+
+    async def iter_upcoming(self, sport, page_size=100, max_pages=50):
+        """Yields rows across every page of the feed, holding one page at a time"""
+        fetched = 0
+        for page_num in range(1, max_pages + 1):
+            rows, total, events = await self.upcoming_page(sport, page_num, page_size)
+            for row in rows:
+                yield row
+            fetched += events
+            if not events or fetched >= total:
+                break
+
+
+class NitterClient:
+    """Hedged Nitter fetches over pooled keep-alive connections, ordered by a rolling score per instance"""
+
+    def __init__(self, instances, hedge=2, hedge_delay=1.5, timeout=10.0, max_failures=2, cooldown=300.0):
+        self.instances = list(instances)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.health = {
+            instance: {"latency": None, "success": 1.0, "failures": 0, "dead_until": 0.0, "requests": 0}
+            for instance in self.instances
+        }
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def score(self, instance):
+        """Lower is better: smoothed latency inflated by the smoothed failure rate"""
+        health = self.health[instance]
+        latency = health["latency"] if health["latency"] is not None else 1.0
+        return latency / max(health["success"], 0.05)
+
+    def ranked(self):
+        now = time.monotonic()
+        alive = [i for i in self.instances if self.health[i]["dead_until"] <= now]
+        if not alive:
+            # Everything is cooling down; try them anyway, soonest-to-recover first
+            return sorted(self.instances, key=lambda i: self.health[i]["dead_until"])
+        return sorted(alive, key=self.score)
+
+    def _record(self, instance, ok, latency=None):
+        health = self.health[instance]
+        health["requests"] += 1
+        if not ok:
+            metrics.inc("sportygrab_nitter_failures_total", instance=instance)
+        health["success"] = 0.7 * health["success"] + 0.3 * (1.0 if ok else 0.0)
+        if ok:
+            health["latency"] = latency if health["latency"] is None else 0.7 * health["latency"] + 0.3 * latency
+            health["failures"] = 0
+            health["dead_until"] = 0.0
+        else:
+            health["failures"] += 1
+            if health["failures"] >= self.max_failures:
+                health["dead_until"] = time.monotonic() + self.cooldown
+
+    async def _get(self, instance, path, params):
+        started = time.perf_counter()
+        try:
+            response = await self._get_client().get(f"{instance}{path}", params=params)
+        except httpx.HTTPError:
+            self._record(instance, False)
+            return None
+        ok = response.status_code == 200
+        self._record(instance, ok, time.perf_counter() - started)
+        return response if ok else None
+
+    async def fetch(self, path, params=None):
+        """Races the best instances and returns (instance, html) from the first 200, or None"""
+        queue = self.ranked()
+        pending = {}
+
+        def launch():
+            instance = queue.pop(0)
+            pending[asyncio.create_task(self._get(instance, path, params))] = instance
+
+        for _ in range(min(self.hedge, len(queue))):
+            launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Nobody answered within the hedge delay; bring in the next best instance
+                    if queue:
+                        launch()
+                    continue
+                for task in done:
+                    instance = pending.pop(task)
+                    response = task.result()
+                    if response is not None:
+                        return instance, response.text
+                    if queue:
+                        launch()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def snapshot(self):
+        now = time.monotonic()
+        return {
+            instance: {
+                "latency": round(health["latency"], 3) if health["latency"] is not None else None,
+                "success": round(health["success"], 3),
+                "requests": health["requests"],
+                "alive": health["dead_until"] <= now,
+                "score": round(self.score(instance), 3),
+            }
+            for instance, health in self.health.items()
+        }
+
+
+# Nitter puts the full timestamp in the date link's title, e.g. "Jan 5, 2024 · 3:04 PM UTC"
+NITTER_DATE_FORMAT = "%b %d, %Y · %I:%M %p UTC"
+
+# Tweets older than this are ignored
+TWEET_MAX_AGE = timedelta(minutes=45)
+
+
+def parse_nitter_date(title):
+    """Fixed-format parse of a Nitter date title, falling back to dateutil for anything else"""
+    try:
+        return datetime.strptime(title.strip(), NITTER_DATE_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        post_time = dateutil.parser.parse(title.replace('·', ' '))
+        return post_time if post_time.tzinfo else post_time.replace(tzinfo=timezone.utc)
+
+
+def parse_nitter_dates(titles):
+    """Vectorized parse_nitter_date: a UTC datetime Series with NaT where a title is missing or unparseable"""
+    titles = pd.Series(titles, dtype=object)
+    posted = pd.to_datetime(titles, format=NITTER_DATE_FORMAT, utc=True, errors="coerce")
+    # Only titles in some other format reach the slow path
+    for i in np.flatnonzero(posted.isna().to_numpy() & (titles.fillna("") != "").to_numpy()):
+        try:
+            posted.iat[i] = parse_nitter_date(titles.iat[i])
+        except (ValueError, OverflowError):
+            continue
+    return posted
+
+
+class NitterTimelineParser(HTMLParser):
+    """Single streaming pass over a Nitter timeline collecting each tweet's date title and text, without building a tree"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.titles = []
+        self.texts = []
+        self._depth = 0
+        self._item = None
+        self._content = None
+        self._date = None
+        self._reset()
+
+    def _reset(self):
+        self._date_title = ''
+        self._link_title = ''
+        self._item_parts = []
+        self._content_parts = []
+        self._content_done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        if tag == 'div':
+            self._depth += 1
+            if 'timeline-item' in classes and self._item is None:
+                self._item = self._depth
+                self._reset()
+            elif 'tweet-content' in classes and self._content is None and not self._content_done:
+                if self._item is None:
+                    # Bare tweet-content blocks (no timeline-item wrapper) are tweets of their own
+                    self._reset()
+                self._content = self._depth
+        elif tag == 'span' and 'tweet-date' in classes:
+            self._date = True
+            self._date_title = self._date_title or attrs.get('title') or ''
+        elif tag == 'a':
+            if self._date:
+                self._date_title = self._date_title or attrs.get('title') or ''
+            if 'tweet-link' in classes:
+                self._link_title = self._link_title or attrs.get('title') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'span':
+            self._date = None
+        if tag != 'div':
+            return
+        if self._content == self._depth:
+            # Only the tweet's own text; quoted tweets carry a tweet-content of their own
+            self._content = None
+            self._content_done = True
+            if self._item is None:
+                self._finish()
+        elif self._item == self._depth:
+            self._item = None
+            self._finish()
+        self._depth -= 1
+
+    def handle_data(self, data):
+        if self._content is not None:
+            self._content_parts.append(data)
+        if self._item is not None:
+            self._item_parts.append(data)
+
+    def _finish(self):
+        self.titles.append(self._date_title or self._link_title)
+        self.texts.append(''.join(self._content_parts or self._item_parts))
+        self._reset()
+
+
+def parse_nitter_timeline(html, limit=50):
+    """(titles, texts) for the first `limit` tweets of a Nitter timeline page"""
+    parser = NitterTimelineParser()
+    parser.feed(html)
+    parser.close()
+    return parser.titles[:limit], parser.texts[:limit]
+
+
+# Six-character tokens that look like codes but are words from the pages themselves
+CODE_STOP_WORDS = frozenset({'SPORTY', 'BETGER', 'UPCOMI', 'VIRTUA', 'FOOTBA', 'BASKET'})
+
+_ODDS_NUMBER = r'\d[\d,]*(?:\.\d+)?'
+
+# One alternation for everything we look for: codes first, then each odds format
+# (`Odds: 1,234`, `1234 odds`, `@ 1234`, `1234x`)
+# `10000x` is an odds value, not a code
+_CODE = r'(?!\d{5}x\b)(?=[A-Z]{0,5}\d)(?=\d{0,5}[A-Z])[A-Z0-9]{6}'
+
+# Codes alone, for checking a text against already-known codes before any odds work
+CODE_PATTERN = re.compile(rf'\b{_CODE}\b', re.IGNORECASE)
+
+CODE_ODDS_PATTERN = re.compile(
+    rf'\b(?P<code>{_CODE})\b'
+    rf'|odds?:\s*(?P<labelled>{_ODDS_NUMBER})'
+    rf'|(?P<suffixed>{_ODDS_NUMBER})\s*odds?\b'
+    rf'|@\s*(?P<at>{_ODDS_NUMBER})'
+    rf'|(?P<times>{_ODDS_NUMBER})x',
+    re.IGNORECASE,
+)
+
+
+class CodeExtractor:
+    """Single-pass scanner returning booking codes with their position and nearest odds value"""
+
+    def __init__(self, stop_words=CODE_STOP_WORDS, window=300):
+        self.stop_words = frozenset(word.upper() for word in stop_words)
+        self.window = window
+
+    def scan(self, text):
+        """Returns ([(code, pos)], [(odds, pos)]) in text order"""
+        codes, odds = [], []
+        for match in CODE_ODDS_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == "code":
+                code = match.group("code").upper()
+                if code not in self.stop_words:
+                    codes.append((code, match.start()))
+            else:
+                try:
+                    odds.append((float(match.group(kind).replace(',', '')), match.start()))
+                except ValueError:
+                    continue
+        return codes, odds
+
+    def extract(self, text, skip=None):
+        """Unique codes in order of appearance as (code, pos, odds); odds is None when none is in range.
+
+        Codes in `skip` are dropped; text holding nothing else returns [] before the odds scan runs.
+        """
+        known = frozenset()
+        if skip is not None:
+            # Each code is looked up once: `in` on a SeenCodeCache counts a hit and refreshes recency
+            candidates = {code.upper() for code in CODE_PATTERN.findall(text)} - self.stop_words
+            known = {code for code in candidates if code in skip}
+            if len(known) == len(candidates):
+                return []
+        codes, odds = self.scan(text)
+        positions = [pos for _, pos in odds]
+        seen = set()
+        found = []
+        for code, pos in codes:
+            if code in seen or code in known:
+                continue
+            seen.add(code)
+            nearest = None
+            i = bisect.bisect_left(positions, pos)
+            for j in (i - 1, i):
+                if 0 <= j < len(odds):
+                    distance = abs(positions[j] - pos)
+                    if self.window is None or distance <= self.window:
+                        if nearest is None or distance < nearest[0]:
+                            nearest = (distance, odds[j][0])
+            found.append((code, pos, nearest[1] if nearest else None))
+        return found
+
+    def codes(self, text):
+        return [code for code, _, _ in self.extract(text)]
+
+
+class SeenCodeCache:
+    """Booking codes already reported, kept across runs: entries expire `ttl` seconds after first sight,
+    memory is bounded by LRU eviction and `path` (JSON) carries them over restarts"""
+
+    def __init__(self, ttl=2700.0, max_entries=10000, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "expired": 0, "evicted": 0}
+        if path:
+            self.load(path)
+
+    def __contains__(self, code):
+        entry = self.entries.get(code)
+        if entry is None:
+            return False
+        if time.time() - entry["first_seen"] > self.ttl:
+            del self.entries[code]
+            self.stats["expired"] += 1
+            return False
+        self.entries.move_to_end(code)
+        self.stats["hits"] += 1
+        return True
+
+    def add(self, code, source, odds, first_seen=None):
+        if code in self.entries:
+            self.entries.move_to_end(code)
+            return
+        self.entries[code] = {"source": source, "odds": odds, "first_seen": first_seen or time.time()}
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def purge(self):
+        cutoff = time.time() - self.ttl
+        for code in [code for code, entry in self.entries.items() if entry["first_seen"] < cutoff]:
+            del self.entries[code]
+            self.stats["expired"] += 1
+
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable seen-code cache %s: %s", path, e)
+            return
+        self.update(entries)
+
+    def update(self, entries):
+        """Merges exported entries; they arrive in LRU order, so re-adding keeps recency"""
+        for code, entry in entries.items():
+            self.add(code, entry.get("source"), entry.get("odds"), entry.get("first_seen"))
+        self.purge()
+
+    def export(self, since=None):
+        """Live entries (first seen at or after `since`, if given) in LRU order"""
+        self.purge()
+        return {code: dict(entry) for code, entry in self.entries.items() if since is None or entry["first_seen"] >= since}
+
+    async def save(self):
+        """Writes live entries to `path` (atomically); no-op without a path"""
+        if not self.path:
+            return
+        self.purge()
+        # Serialized on the loop so scrapes adding codes meanwhile can't change the dict mid-dump
+        await asyncio.to_thread(self._write, json.dumps(self.entries))
+
+    def _write(self, text):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, self.path)
+
+    def snapshot(self):
+        return {"entries": len(self.entries), "ttl": self.ttl, "max_entries": self.max_entries, "path": self.path, **self.stats}
+
+
+class SQLiteStore:
+    """Write-batched SQLite (WAL) history of results and booking codes"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        match TEXT, sport TEXT, market TEXT,
+        odds REAL, odds_value TEXT, outcomes TEXT,
+        created_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS booking_codes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        code TEXT, source TEXT, sport TEXT,
+        odds REAL, status TEXT, posted TEXT,
+        created_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_results_sport_time ON results (sport, created_at);
+    CREATE INDEX IF NOT EXISTS idx_results_odds_time ON results (odds, created_at);
+    CREATE INDEX IF NOT EXISTS idx_results_time ON results (created_at);
+    CREATE INDEX IF NOT EXISTS idx_codes_code ON booking_codes (code);
+    CREATE INDEX IF NOT EXISTS idx_codes_sport_time ON booking_codes (sport, created_at);
+    CREATE INDEX IF NOT EXISTS idx_codes_odds_time ON booking_codes (odds, created_at);
+    CREATE INDEX IF NOT EXISTS idx_codes_time ON booking_codes (created_at);
+    """
+
+    def __init__(self, path=":memory:", batch_size=100, flush_interval=1.0, max_pending=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._db = None
+        self._lock = threading.Lock()
+        self._pending = {"results": [], "booking_codes": []}
+        self._wake = None
+        self._flusher = None
+
+    @property
+    def _conn(self):
+        """Opened (schema and pragmas applied) on first use, so importing the module never touches the file;
+        callers hold self._lock"""
+        if self._db is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._db = conn
+        return self._db
+
+    def max_id(self, table):
+        with self._lock:
+            return self._conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    async def start(self):
+        if self._flusher is None:
+            self._wake = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except sqlite3.Error as e:
+                logger.warning("Store flush failed, batch re-queued for the next flush: %s", e)
+
+    def _queue(self, table, row):
+        self._pending[table].append(row)
+        if self._wake is not None and len(self._pending[table]) >= self.batch_size:
+            self._wake.set()
+
+    def add_result(self, res):
+        try:
+            odds = float(res["odds_value"])
+        except (TypeError, ValueError):
+            odds = None
+        self._queue("results", (
+            res["id"], res["match"], res["sport"].capitalize(), res["market"], odds, res["odds_value"],
+            json.dumps(res.get("outcomes", [])), time.time(),
+        ))
+
+    def add_booking_code(self, res):
+        self._queue("booking_codes", (
+            res["code"], res["source"], res["sport"].capitalize(), res["odds"], res["status"], res.get("posted"), time.time(),
+        ))
+
+    async def flush(self):
+        pending, self._pending = self._pending, {"results": [], "booking_codes": []}
+        if pending["results"] or pending["booking_codes"]:
+            try:
+                await asyncio.to_thread(self._write, pending)
+            except sqlite3.Error:
+                # The transaction rolled back, so the batch goes back in front of anything queued since
+                self._requeue(pending)
+                raise
+
+    def _requeue(self, pending):
+        for table, rows in pending.items():
+            rows = rows + self._pending[table]
+            # Bounded so a store that keeps failing can't grow memory without limit
+            excess = len(rows) - self.max_pending
+            if excess > 0:
+                logger.error("Store still failing; dropped the %d oldest unwritten %s rows", excess, table)
+                rows = rows[excess:]
+            self._pending[table] = rows
+
+    def _write(self, pending):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (id, match, sport, market, odds, odds_value, outcomes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", pending["results"])
+            self._conn.executemany(
+                "INSERT INTO booking_codes (code, source, sport, odds, status, posted, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", pending["booking_codes"])
+
+    def _where(self, sport=None, code=None, min_odds=None, since_minutes=None, start=None, end=None):
+        clauses, params = [], []
+        if sport:
+            # Stored capitalized; a plain comparison can use the (sport, created_at) indexes, NOCASE could not
+            clauses.append("sport = ?")
+            params.append(sport.capitalize())
+        if code:
+            clauses.append("code = ?")
+            params.append(code.upper())
+        if min_odds is not None:
+            clauses.append("odds >= ?")
+            params.append(min_odds)
+        if since_minutes is not None:
+            clauses.append("created_at >= ?")
+            params.append(time.time() - since_minutes * 60)
+        if start is not None:
+            clauses.append("created_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("created_at < ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, table, filters, limit, offset):
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM {table}{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        items = [dict(row) for row in rows]
+        for item in items:
+            if "outcomes" in item:
+                item["outcomes"] = json.loads(item["outcomes"] or "[]")
+        return items
+
+    def chunks(self, table, chunk_size=1000, **filters):
+        """Matching rows in id order, a chunk at a time; keyset pagination keeps every query cheap and memory flat"""
+        where, params = self._where(**filters)
+        where = f"{where} AND id > ?" if where else " WHERE id > ?"
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM {table}{where} ORDER BY id LIMIT ?", params + [last_id, chunk_size],
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    async def iter_chunks(self, table, chunk_size=1000, **filters):
+        await self.flush()
+        chunks = self.chunks(table, chunk_size, **filters)
+        while True:
+            rows = await asyncio.to_thread(next, chunks, None)
+            if rows is None:
+                return
+            yield rows
+
+    async def query_results(self, sport=None, min_odds=None, since_minutes=None, limit=50, offset=0):
+        await self.flush()
+        filters = {"sport": sport, "min_odds": min_odds, "since_minutes": since_minutes}
+        return await asyncio.to_thread(self._select, "results", filters, limit, offset)
+
+    async def query_booking_codes(self, sport=None, code=None, min_odds=None, since_minutes=None, limit=50, offset=0):
+        await self.flush()
+        filters = {"sport": sport, "code": code, "min_odds": min_odds, "since_minutes": since_minutes}
+        return await asyncio.to_thread(self._select, "booking_codes", filters, limit, offset)
+
+
+class OddsSnapshot:
+    """Last known odds per sport, keyed by (match, market), diffed record by record as a scrape streams in"""
+
+    def __init__(self):
+        self._markets = {}
+        self._seen = {}
+
+    def begin(self, sport):
+        self._seen[sport] = set()
+
+    def observe(self, sport, key, outcomes):
+        """Returns an (event, key, old, new) tuple, or None if the odds did not move"""
+        markets = self._markets.setdefault(sport, {})
+        self._seen.setdefault(sport, set()).add(key)
+        old = markets.get(key)
+        markets[key] = outcomes
+        if old is None:
+            return ("added", key, None, outcomes)
+        if old != outcomes:
+            return ("changed", key, old, outcomes)
+        return None
+
+    def finish(self, sport):
+        """Ends a complete scrape; everything it did not see is reported removed"""
+        seen = self._seen.pop(sport, set())
+        markets = self._markets.get(sport, {})
+        gone = [key for key in markets if key not in seen]
+        return [("removed", key, markets.pop(key), None) for key in gone]
+
+    def abort(self, sport):
+        """Ends an incomplete scrape without guessing at removals"""
+        self._seen.pop(sport, None)
+
+
+class Quota:
+    """Target shared by concurrent sources; claims are atomic since they never await"""
+
+    def __init__(self, target):
+        self.target = target
+        self.claimed = set()
+        self.reached = asyncio.Event()
+
+    @property
+    def taken(self):
+        return len(self.claimed)
+
+    @property
+    def full(self):
+        return self.taken >= self.target
+
+    def claim(self, key):
+        """True if key was new and there was room for it"""
+        if self.full or key in self.claimed:
+            return False
+        self.claimed.add(key)
+        if self.full:
+            self.reached.set()
+        return True
+
+
+async def fan_out(coros, quota, timeout=None):
+    """Runs coros concurrently until they all finish, the quota fills or the timeout passes; the rest are cancelled"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    reached = asyncio.create_task(quota.reached.wait())
+    pending = set(tasks)
+    try:
+        while pending and not quota.reached.is_set():
+            remaining = deadline - loop.time() if deadline else None
+            if remaining is not None and remaining <= 0:
+                break
+            _, pending = await asyncio.wait(pending | {reached}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(reached)
+    finally:
+        # Cancelling unwinds each source's own cleanup (pooled pages, HTTP requests)
+        for task in pending | {reached}:
+            task.cancel()
+        await asyncio.gather(*tasks, reached, return_exceptions=True)
+    return [task.result() if not task.cancelled() and task.exception() is None else None for task in tasks]
+
+
+class Scheduler:
+    """Runs scrape jobs under a global concurrency limit; identical in-flight jobs are coalesced"""
+
+    def __init__(self, sources, concurrency=2, history=200, max_backoff=900.0):
+        self.sources = sources
+        self.max_backoff = max_backoff
+        self.history = history
+        self.jobs = OrderedDict()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._ids = itertools.count(1)
+        self._in_flight = {}
+        self._tasks = {}
+        self._periodic = []
+        self._periodic_tasks = []
+
+    def submit(self, source, **params):
+        """Returns (job, coalesced); callers asking for a job that is already queued or running share it"""
+        if source not in self.sources:
+            raise KeyError(source)
+        key = (source, tuple(sorted(params.items())))
+        job_id = self._in_flight.get(key)
+        if job_id is not None:
+            job = self.jobs[job_id]
+            job["coalesced"] += 1
+            return job, True
+        job = {
+            "id": next(self._ids),
+            "source": source,
+            "params": params,
+            "status": "queued",
+            "coalesced": 0,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self.jobs[job["id"]] = job
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs))
+            if oldest in self._tasks:
+                break
+            del self.jobs[oldest]
+        self._in_flight[key] = job["id"]
+        self._tasks[job["id"]] = asyncio.create_task(self._run(key, job))
+        return job, False
+
+    async def _run(self, key, job):
+        try:
+            async with self._slots:
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                await self.sources[job["source"]](**job["params"])
+            job["status"] = "done"
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+            metrics.inc("sportygrab_jobs_total", source=job["source"], status=job["status"])
+            if job["started_at"]:
+                metrics.observe("sportygrab_job_seconds", job["finished_at"] - job["started_at"], source=job["source"])
+            self._in_flight.pop(key, None)
+            self._tasks.pop(job["id"], None)
+
+    async def wait(self, job_id):
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.gather(asyncio.shield(task), return_exceptions=True)
+        return self.jobs.get(job_id)
+
+    def every(self, source, interval, **params):
+        """Registers a periodic job; started with start()"""
+        self._periodic.append((source, interval, params))
+
+    async def start(self):
+        for source, interval, params in self._periodic:
+            self._periodic_tasks.append(asyncio.create_task(self._periodic_loop(source, interval, params)))
+
+    async def stop(self):
+        tasks = self._periodic_tasks + list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._periodic_tasks = []
+
+    async def _periodic_loop(self, source, interval, params):
+        failures = 0
+        while True:
+            job, _ = self.submit(source, **params)
+            job = await self.wait(job["id"])
+            failures = failures + 1 if job["status"] == "failed" else 0
+            # Exponential backoff on consecutive failures, with jitter so sources drift apart
+            delay = min(interval * 2 ** failures, max(self.max_backoff, interval))
+            await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+
+    def snapshot(self, limit=50):
+        return {
+            "in_flight": len(self._tasks),
+            "periodic": [{"source": source, "interval": interval, "params": params} for source, interval, params in self._periodic],
+            "jobs": list(reversed(self.jobs.values()))[:limit],
+        }
+
+
+class WorkerRelay:
+    """Stands in for the broadcaster, store and odds snapshot inside a worker process; everything is shipped to the API process"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.job_id = None
+
+    def send(self, kind, payload):
+        self.conn.send((kind, self.job_id, payload))
+
+    def publish(self, message):
+        self.send("message", message)
+
+    # The API process assigns ids and persists what it receives
+    def add_result(self, res):
+        pass
+
+    def add_booking_code(self, res):
+        pass
+
+    # Odds are diffed against the API process's snapshot, whichever worker ran the previous scrape
+    def begin(self, sport):
+        self.send("snapshot", ("begin", sport))
+
+    def observe(self, sport, key, outcomes):
+        self.send("snapshot", ("observe", sport, key, outcomes))
+        return None
+
+    def finish(self, sport):
+        self.send("snapshot", ("finish", sport))
+        return []
+
+    def abort(self, sport):
+        self.send("snapshot", ("abort", sport))
+
+
+class WorkerTier:
+    """Runs scrape jobs in a pool of worker processes; the API process only schedules them and relays their output.
+
+    Each worker has its own pipe and the API process hands a job to an idle worker itself, so a worker that dies
+    holds no shared lock and fails exactly the job recorded against it.
+    """
+
+    def __init__(self, processes, options, scraper, stop_timeout=10.0):
+        self.processes = processes
+        self.options = options
+        # The API process's scraper: it stores, diffs and broadcasts what workers send back
+        self.scraper = scraper
+        self.stop_timeout = stop_timeout
+        self.stats = {"jobs": 0, "failed": 0, "restarts": 0}
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._idle = None
+        self._futures = {}
+        self._waiting = 0
+        # Each worker's browser pool as of its last job, by pid
+        self.pools = {}
+        self._seen_dirty = False
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._reader = None
+        self._stopping = False
+
+    def _spawn(self):
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=worker_main, args=(child_conn, self.options), daemon=True)
+        process.start()
+        # Only the worker holds its end, so the pipe reports EOF as soon as the worker dies
+        child_conn.close()
+        worker = {"process": process, "conn": conn, "job": None, "lost": False}
+        self._workers.append(worker)
+        self._idle.put_nowait(worker)
+        return worker
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        for _ in range(self.processes):
+            self._spawn()
+        self._reader = threading.Thread(target=self._read_events, name="worker-events", daemon=True)
+        self._reader.start()
+
+    async def stop(self):
+        self._stopping = True
+        for worker in self._workers:
+            try:
+                worker["conn"].send(None)
+            except OSError:
+                pass
+        await asyncio.to_thread(self._join)
+        await asyncio.to_thread(self._reader.join, self.stop_timeout)
+        for worker in self._workers:
+            worker["conn"].close()
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(RuntimeError("worker tier stopped"))
+        self._futures.clear()
+
+    def _join(self):
+        deadline = time.monotonic() + self.stop_timeout
+        for worker in self._workers:
+            process = worker["process"]
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def _read_events(self):
+        # Blocking pipe reads stay off the event loop
+        while not self._stopping:
+            conns = {worker["conn"]: worker for worker in list(self._workers) if not worker["lost"]}
+            for conn in multiprocessing.connection.wait(list(conns), timeout=0.5):
+                worker = conns[conn]
+                try:
+                    item = conn.recv()
+                except (EOFError, OSError):
+                    worker["lost"] = True
+                    self._loop.call_soon_threadsafe(self._worker_lost, worker)
+                    continue
+                self._loop.call_soon_threadsafe(self._dispatch, worker, item)
+
+    def _dispatch(self, worker, item):
+        kind, job_id, payload = item
+        if kind == "message":
+            self.scraper.ingest(payload)
+        elif kind == "snapshot":
+            self.scraper.ingest_snapshot(*payload)
+        elif kind == "seen":
+            self.scraper.seen.update(payload)
+            self._seen_dirty = self._seen_dirty or bool(payload)
+        elif kind == "metrics":
+            metrics.merge(payload)
+        elif kind == "pool":
+            self.pools[worker["process"].pid] = payload
+        elif kind == "done":
+            worker["job"] = None
+            self._idle.put_nowait(worker)
+            self._resolve(job_id, payload)
+
+    def _resolve(self, job_id, error):
+        future = self._futures.pop(job_id, None)
+        if future is None or future.done():
+            return
+        if error:
+            self.stats["failed"] += 1
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(None)
+
+    def _worker_lost(self, worker):
+        if self._stopping or worker not in self._workers:
+            return
+        self._workers.remove(worker)
+        asyncio.create_task(self._replace(worker))
+
+    async def _replace(self, worker):
+        """Fails the job the dead worker was holding and starts a fresh worker in its place"""
+        process = worker["process"]
+        await asyncio.to_thread(process.join, self.stop_timeout)
+        if process.is_alive():
+            process.terminate()
+            await asyncio.to_thread(process.join)
+        worker["conn"].close()
+        logger.warning("Worker %s exited with %s; restarting", process.pid, process.exitcode)
+        self.stats["restarts"] += 1
+        self.pools.pop(process.pid, None)
+        if worker["job"] is not None:
+            self._resolve(worker["job"], f"worker {process.pid} exited with {process.exitcode}")
+        if not self._stopping:
+            self._spawn()
+
+    async def run(self, source, **params):
+        job_id = next(self._ids)
+        self.stats["jobs"] += 1
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+            # Workers that died while idle are skipped; their replacement is queued separately
+            while worker["lost"] or worker not in self._workers:
+                worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        future = self._loop.create_future()
+        self._futures[job_id] = future
+        # Recorded before sending, so a worker dying at any point after this fails this job
+        worker["job"] = job_id
+        try:
+            # Workers start every job knowing every code reported so far, through any worker
+            job = (job_id, source, params, self.scraper.seen.export())
+            try:
+                await asyncio.to_thread(worker["conn"].send, job)
+            except OSError:
+                pass  # The reader sees the dead pipe and fails the job
+            await future
+        finally:
+            self._futures.pop(job_id, None)
+            if self._seen_dirty:
+                self._seen_dirty = False
+                await self.scraper.seen.save()
+
+    def snapshot(self):
+        return {
+            "processes": self.processes,
+            "alive": sum(worker["process"].is_alive() for worker in self._workers),
+            "pids": [worker["process"].pid for worker in self._workers],
+            "running": sum(worker["job"] is not None for worker in self._workers),
+            "pending": self._waiting,
+            **self.stats,
+        }
+
+
+class Broadcaster:
+    """Fans each message out to WebSocket clients through their own bounded queue and writer task"""
+
+    def __init__(self, queue_size=256, policy="drop_oldest", replay_size=1000, batch_window=0.05, max_batch=200):
+        self.queue_size = queue_size
+        # "drop_oldest" discards a slow client's oldest queued frame, "disconnect" evicts the client
+        self.policy = policy
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.clients = {}
+        # Every event gets a sequence number; the tail is kept so reconnecting clients can catch up.
+        # Seeding from the clock keeps numbers increasing across restarts.
+        self._seq = itertools.count(int(time.time() * 1000))
+        self.replay = deque(maxlen=replay_size)
+        self.stats = {"published": 0, "delivered": 0, "frames": 0, "dropped": 0, "evicted": 0, "send_errors": 0}
+
+    def connect(self, websocket, batch=False, since=None):
+        """Registers a client; with since, first queues every logged event after that sequence number"""
+        client = {"queue": asyncio.Queue(self.queue_size), "dropped": 0, "batch": batch}
+        self.clients[websocket] = client
+        if since is not None:
+            # Replay at most a queue's worth, leaving room for a gap notice
+            missed = [(seq, text) for seq, text in self.replay if seq > since][-(self.queue_size - 1):]
+            first = missed[0][0] if missed else next(iter(self.replay), (since + 1,))[0]
+            if first > since + 1:
+                client["queue"].put_nowait(json.dumps({"type": "gap", "from": since + 1, "to": first - 1}))
+            for _, text in missed:
+                client["queue"].put_nowait(text)
+        client["task"] = asyncio.create_task(self._writer(websocket, client))
+
+    def disconnect(self, websocket):
+        client = self.clients.pop(websocket, None)
+        if client and client.get("task") and client["task"] is not asyncio.current_task():
+            client["task"].cancel()
+
+    async def close(self):
+        tasks = [client["task"] for client in self.clients.values()]
+        self.clients.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def publish(self, message):
+        """Numbers and serializes once, then enqueues for every client without waiting on any of them"""
+        started = time.perf_counter()
+        self.stats["published"] += 1
+        seq = next(self._seq)
+        text = json.dumps({**message, "seq": seq})
+        self.replay.append((seq, text))
+        for websocket, client in list(self.clients.items()):
+            self._enqueue(websocket, client, text)
+        metrics.observe("sportygrab_stage_seconds", time.perf_counter() - started, stage="broadcast")
+
+    def _enqueue(self, websocket, client, text):
+        queue = client["queue"]
+        if queue.full():
+            client["dropped"] += 1
+            self.stats["dropped"] += 1
+            metrics.inc("sportygrab_ws_dropped_messages_total")
+            if self.policy == "disconnect":
+                self._evict(websocket)
+                return
+            queue.get_nowait()
+        queue.put_nowait(text)
+
+    def _evict(self, websocket):
+        self.stats["evicted"] += 1
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_socket(websocket))
+
+    async def _close_socket(self, websocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _writer(self, websocket, client):
+        queue = client["queue"]
+        try:
+            while True:
+                texts = [await queue.get()]
+                if client["batch"]:
+                    # Let a burst accumulate, then ship it as one frame of already-serialized events
+                    await asyncio.sleep(self.batch_window)
+                    while not queue.empty() and len(texts) < self.max_batch:
+                        texts.append(queue.get_nowait())
+                    await websocket.send_text('{"type": "batch", "events": [' + ", ".join(texts) + ']}')
+                else:
+                    await websocket.send_text(texts[0])
+                self.stats["frames"] += 1
+                self.stats["delivered"] += len(texts)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead socket: forget it rather than failing every later publish
+            self.stats["send_errors"] += 1
+            self.disconnect(websocket)
+
+    def snapshot(self):
+        depths = [client["queue"].qsize() for client in self.clients.values()]
+        return {
+            **self.stats,
+            "last_seq": self.replay[-1][0] if self.replay else 0,
+            "clients": len(self.clients),
+            "queue_size": self.queue_size,
+            "policy": self.policy,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+        }
+
+
+class SportybetScraper:
+    def __init__(self, pool=None, nitter=None, store=None, broadcaster=None, api=None, seen=None, snapshots=None,
+                 live_buffer_size=500, code_delay=0.2):
+        self.pool = pool or BrowserPool()
+        # JSON fast path for the upcoming listings; None always renders them in Chromium
+        self.api = api
+        self.broadcaster = broadcaster or Broadcaster()
+        self.nitter = nitter or NitterClient(NITTER_INSTANCES)
+        self.store = store or SQLiteStore()
+        self.extractor = CodeExtractor()
+        # Codes reported by earlier runs are skipped until their TTL runs out
+        self.seen = seen if seen is not None else SeenCodeCache()
+        # Pause after each booking code so the dashboard shows them arriving one by one
+        self.code_delay = code_delay
+        self.snapshots = snapshots or OddsSnapshot()
+        self.code_sources = [self.scrape_official_hub, self.scrape_twitter]
         self.url_football = 'https://www.sportybet.com/ng/sport/football/upcoming?time=24'
         self.url_basketball = 'https://www.sportybet.com/ng/sport/basketball/upcoming?time=24'
         self.url_code_hub = 'https://www.sportybet.com/ng/m/code-hub/codes'
-        self.results = []
-        self.booking_codes = []
+        # Live view only; the full history lives in self.store
+        self.results = deque(maxlen=live_buffer_size)
+        self.booking_codes = deque(maxlen=live_buffer_size)
+        # Continues after the stored history; read on first use so constructing a scraper opens no database
+        self._result_ids = None
     
+    def next_result_id(self):
+        if self._result_ids is None:
+            self._result_ids = itertools.count(self.store.max_id("results") + 1)
+        return next(self._result_ids)
+
     async def send_update(self, message: dict):
-        for connection in active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        self.broadcaster.publish(message)
+
+    def ingest(self, message):
+        """Records and broadcasts a message relayed from a worker process"""
+        data = message.get("data")
+        if message["type"] == "booking_code":
+            # Workers keep their own caches, so two of them can still report the same code
+            if data["code"] in self.seen:
+                return
+            self.seen.add(data["code"], data["source"], data["odds"])
+            self.booking_codes.append(data)
+            self.store.add_booking_code(data)
+        self.broadcaster.publish(message)
 
     def is_recent(self, date_str):
         """Checks if a post is within the last 45 minutes"""
         try:
-            clean_date = date_str.split('·')[0].strip()
-            post_time = dateutil.parser.parse(clean_date)
-            if post_time.tzinfo is None:
-                post_time = post_time.replace(tzinfo=timezone.utc)
-            
+            post_time = parse_nitter_date(date_str)
             now = datetime.now(timezone.utc)
-            return (now - post_time) <= timedelta(minutes=45)
+            return (now - post_time) <= TWEET_MAX_AGE
         except:
             return True
 
     def extract_6char_codes(self, text):
         """Strictly 6-character alphanumeric Sportybet codes"""
-        found = re.findall(r'\b([A-Z0-9]{6})\b', text.upper())
-        valid = []
-        for c in found:
-            if any(char.isdigit() for char in c) and any(char.isalpha() for char in c):
-                if c not in ['SPORTY', 'BETGER', 'UPCOMI', 'VIRTUA', 'FOOTBA', 'BASKET']:
-                    valid.append(c)
-        return list(set(valid))
+        return self.extractor.codes(text)
+
+    async def add_booking_code(self, code, source, sport, odds, status, posted=None):
+        res = {
+            "code": code,
+            "source": source,
+            "sport": sport.capitalize(),
+            "odds": odds,
+            "status": status,
+            "posted": posted,
+            "timestamp": datetime.now().strftime("%H:%M:%S")
+        }
+        self.seen.add(code, source, odds)
+        self.booking_codes.append(res)
+        self.store.add_booking_code(res)
+        metrics.inc("sportygrab_codes_found_total", source=source)
+        await self.send_update({"type": "booking_code", "data": res})
+        if self.code_delay:
+            await asyncio.sleep(self.code_delay)
+
+    async def iter_page_rows(self, page, batch=50, max_reveals=50):
+        """Yields listing rows in batches of one evaluate each, following pagination or infinite scroll"""
+        offset = 0
+        for _ in range(max_reveals):
+            while True:
+                with metrics.timer("sportygrab_stage_seconds", stage="dom_extract"):
+                    scanned, rows = await page.evaluate(UPCOMING_ROWS_JS, [offset, batch])
+                offset += scanned
+                for h, a, odds in rows:
+                    yield {"home": h, "away": a, "odds": odds}
+                if scanned < batch:
+                    break
+            try:
+                if await page.evaluate(UPCOMING_MORE_JS) == "page":
+                    await page.wait_for_function(
+                        "() => { const f = document.querySelector('.m-table-row'); return f && f.innerText !== window.__sportygrabFirstRow; }",
+                        timeout=5000)
+                    offset = 0
+                else:
+                    await page.wait_for_function("(n) => document.querySelectorAll('.m-table-row').length > n", arg=offset, timeout=3000)
+            except PlaywrightTimeoutError:
+                return
+
+    async def iter_upcoming(self, sport):
+        """Every row of a 24h listing: JSON feed first, the rendered pages if that fails"""
+        if self.api:
+            try:
+                streamed = 0
+                async for row in self.api.iter_upcoming(sport):
+                    streamed += 1
+                    yield row
+                if streamed:
+                    return
+            except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+                # Rows already streamed are simply seen again below, which the snapshot treats as unchanged
+                await self.send_update({"type": "status", "message": f"Fast path failed ({e}), using browser", "color": "yellow"})
+        async with self.pool.page() as page:
+            await self.pool.load(page, getattr(self, f"url_{sport}"), ready_selector='.m-table-row')
+            async for row in self.iter_page_rows(page):
+                yield row
+
+    async def scrape_upcoming(self, sport, min_odds=None):
+        """Shared upcoming-listing scraper, driven by UPCOMING_SPORTS; records are handled as they stream in"""
+        config = UPCOMING_SPORTS[sport]
+        label = config["label"]
+        self.snapshots.begin(label)
+        try:
+            async for row in self.iter_upcoming(sport):
+                metrics.inc("sportygrab_rows_parsed_total", sport=label)
+                if len(row["odds"]) < config["min_outcomes"]:
+                    continue
+                if min_odds is not None:
+                    try:
+                        if float(row["odds"][0]) < min_odds:
+                            continue
+                    except ValueError:
+                        continue
+                key = (f"{row['home']} vs {row['away']}", config["market"])
+                # Only what moved since the previous scrape of this sport is stored and broadcast
+                event = self.snapshots.observe(label, key, tuple(row["odds"]))
+                if event:
+                    await self.publish_odds_event(label, *event)
+        except BaseException:
+            self.snapshots.abort(label)
+            raise
+        for event in self.snapshots.finish(label):
+            await self.publish_odds_event(label, *event)
+
+    def ingest_snapshot(self, op, sport, key=None, outcomes=None):
+        """Applies a worker's odds-snapshot call to this process's snapshot and publishes what moved"""
+        if op == "observe":
+            events = [self.snapshots.observe(sport, key, outcomes)]
+        elif op == "finish":
+            events = self.snapshots.finish(sport)
+        else:
+            getattr(self.snapshots, op)(sport)
+            events = []
+        for event in events:
+            if event:
+                self.broadcaster.publish(self.record_odds_event(sport, *event))
+
+    async def publish_odds_event(self, sport, event, key, old, new):
+        await self.send_update(self.record_odds_event(sport, event, key, old, new))
+
+    def record_odds_event(self, sport, event, key, old, new):
+        """Stores an odds event and returns its dashboard message"""
+        metrics.inc("sportygrab_odds_events_total", sport=sport, event=event)
+        match, market = key
+        res = {
+            "match": match,
+            "sport": sport,
+            "market": market,
+            "timestamp": datetime.now().strftime("%H:%M:%S")
+        }
+        if old is not None:
+            res["old_odds"] = old[0]
+            res["old_outcomes"] = list(old)
+        if new is not None:
+            res["id"] = self.next_result_id()
+            res["odds_value"] = new[0]
+            res["outcomes"] = list(new)
+            self.results.append(res)
+            self.store.add_result(res)
+        return {"type": "result", "event": event, "data": res}
 
     async def scrape_football(self):
         await self.send_update({"type": "status", "message": "⚽ Scraping Football Odds...", "color": "blue"})
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            try:
-                await page.goto(self.url_football, timeout=30000)
-                await asyncio.sleep(5)
-                matches = await page.query_selector_all('.m-table-row')
-                for match in matches[:15]:
-                    teams = await match.query_selector('.teams')
-                    if not teams: continue
-                    h = await (await teams.query_selector('.home-team')).inner_text()
-                    a = await (await teams.query_selector('.away-team')).inner_text()
-                    odds = await match.query_selector_all('.m-outcome-odds')
-                    if len(odds) >= 3:
-                        res = {
-                            "id": len(self.results) + 1,
-                            "match": f"{h} vs {a}",
-                            "sport": "Football",
-                            "market": "1X2",
-                            "odds_value": await odds[0].inner_text(),
-                            "timestamp": datetime.now().strftime("%H:%M:%S")
-                        }
-                        self.results.append(res)
-                        await self.send_update({"type": "result", "data": res})
-            finally:
-                await browser.close()
+        await self.scrape_upcoming("football")
 
     async def scrape_basketball(self, min_odds=1.0):
         await self.send_update({"type": "status", "message": f"🏀 Scraping Basketball (min {min_odds})...", "color": "blue"})
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            try:
-                await page.goto(self.url_basketball, timeout=30000)
-                await asyncio.sleep(5)
-                matches = await page.query_selector_all('.m-table-row')
-                for match in matches[:15]:
-                    teams = await match.query_selector('.teams')
-                    if not teams: continue
-                    h = await (await teams.query_selector('.home-team')).inner_text()
-                    a = await (await teams.query_selector('.away-team')).inner_text()
-                    odds = await match.query_selector_all('.m-outcome-odds')
-                    if odds:
-                        val = await odds[0].inner_text()
-                        if float(val) >= min_odds:
-                            res = {"id": len(self.results) + 1, "match": f"{h} vs {a}", "sport": "Basketball", "market": "1X2", "odds_value": val, "timestamp": datetime.now().strftime("%H:%M:%S")}
-                            self.results.append(res)
-                            await self.send_update({"type": "result", "data": res})
-            finally:
-                await browser.close()
+        await self.scrape_upcoming("basketball", min_odds)
 
-    async def scrape_official_hub(self, sport, target_min_odds, processed_codes, codes_found_so_far):
+    async def extract_hub_cards(self, page, sport):
+        """(code, odds, sport, posted) records from the innermost distinct code-hub cards, read in one evaluate"""
+        with metrics.timer("sportygrab_stage_seconds", stage="dom_extract"):
+            cards = await page.evaluate(HUB_CARDS_JS, HUB_CARD_SELECTOR)
+        records = []
+        with metrics.timer("sportygrab_stage_seconds", stage="regex_parse"):
+            for text, posted in cards:
+                sport_match = HUB_SPORT_PATTERN.search(text)
+                card_sport = sport_match.group(0) if sport_match else sport
+                for code, _, current_odds in self.extractor.extract(text, skip=self.seen):
+                    records.append({"code": code, "odds": current_odds, "sport": card_sport.capitalize(), "posted": posted})
+        return records
+
+    async def scrape_official_hub(self, sport, target_min_odds, quota):
         """Scrape from Sportybet official code hub"""
         await self.send_update({"type": "status", "message": f"📱 Scraping Official Hub...", "color": "blue"})
         
-        codes_found = codes_found_so_far
+        codes_found = 0
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--disable-blink-features=AutomationControlled']
-            )
-            context = await browser.new_context(
-                viewport={'width': 375, 'height': 812},
-                user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15'
-            )
-            page = await context.new_page()
+        try:
+            async with self.pool.page("mobile") as page:
+                await self.pool.load(page, self.url_code_hub, ready_function=HUB_READY_JS, ready_arg=HUB_CARD_SELECTOR)
+                cards = await self.extract_hub_cards(page, sport)
+                # Full-text fallback only when the card layout yields nothing
+                page_text = '' if cards else await page.evaluate('() => document.body.innerText')
             
-            try:
-                await page.goto(self.url_code_hub, timeout=30000)
-                await asyncio.sleep(5)
-                
-                # Get all text content
-                page_text = await page.evaluate('() => document.body.innerText')
-                
-                # Find all potential code containers
-                code_containers = await page.query_selector_all('div[class*="code"], div[class*="card"], div[class*="item"]')
-                
-                # Method 1: Structured extraction
-                for container in code_containers:
-                    if codes_found >= 10:
-                        break
-                    
-                    try:
-                        container_text = await container.inner_text()
-                        codes = self.extract_6char_codes(container_text)
-                        
-                        for code in codes:
-                            if code in processed_codes or codes_found >= 10:
-                                continue
-                            
-                            odds_match = re.search(r'Odds?:\s*([\d,]+\.?\d*)', container_text, re.IGNORECASE)
-                            
-                            if odds_match:
-                                odds_str = odds_match.group(1).replace(',', '')
-                                try:
-                                    current_odds = float(odds_str)
-                                    
-                                    if current_odds >= target_min_odds:
-                                        processed_codes.add(code)
-                                        codes_found += 1
-                                        
-                                        res = {
-                                            "code": code,
-                                            "source": "Official Hub",
-                                            "sport": sport.capitalize(),
-                                            "odds": current_odds,
-                                            "status": "1K+ Official",
-                                            "timestamp": datetime.now().strftime("%H:%M:%S")
-                                        }
-                                        self.booking_codes.append(res)
-                                        await self.send_update({"type": "booking_code", "data": res})
-                                        await asyncio.sleep(0.2)
-                                except ValueError:
-                                    continue
-                    except Exception as e:
-                        continue
-                
-                # Method 2: Full text parsing if needed
-                if codes_found < 10:
-                    all_codes = self.extract_6char_codes(page_text)
-                    
-                    for code in all_codes:
-                        if code in processed_codes or codes_found >= 10:
-                            break
-                        
-                        code_pos = page_text.upper().find(code)
-                        if code_pos != -1:
-                            context_start = max(0, code_pos - 300)
-                            context_end = min(len(page_text), code_pos + 300)
-                            context = page_text[context_start:context_end]
-                            
-                            odds_match = re.search(r'Odds?:\s*([\d,]+\.?\d*)', context, re.IGNORECASE)
-                            
-                            if odds_match:
-                                odds_str = odds_match.group(1).replace(',', '')
-                                try:
-                                    current_odds = float(odds_str)
-                                    
-                                    if current_odds >= target_min_odds:
-                                        processed_codes.add(code)
-                                        codes_found += 1
-                                        
-                                        res = {
-                                            "code": code,
-                                            "source": "Official Hub",
-                                            "sport": sport.capitalize(),
-                                            "odds": current_odds,
-                                            "status": "1K+ Official",
-                                            "timestamp": datetime.now().strftime("%H:%M:%S")
-                                        }
-                                        self.booking_codes.append(res)
-                                        await self.send_update({"type": "booking_code", "data": res})
-                                        await asyncio.sleep(0.2)
-                                except ValueError:
-                                    continue
-                
-                await self.send_update({
-                    "type": "status",
-                    "message": f"✓ Official Hub: Found {codes_found - codes_found_so_far} codes",
-                    "color": "green"
-                })
-                
-            except Exception as e:
-                await self.send_update({
-                    "type": "status",
-                    "message": f"Official Hub error: {str(e)}",
-                    "color": "red"
-                })
-            finally:
-                await browser.close()
+            if not cards:
+                cards = [
+                    {"code": code, "odds": current_odds, "sport": sport.capitalize(), "posted": None}
+                    for code, _, current_odds in self.extractor.extract(page_text, skip=self.seen)
+                ]
+            
+            for card in cards:
+                if quota.full:
+                    break
+                if card["odds"] is None or card["odds"] < target_min_odds:
+                    metrics.inc("sportygrab_codes_rejected_total", source="Official Hub", reason="odds")
+                    if card["odds"] is not None:
+                        # Known too low; not worth parsing again until the TTL runs out
+                        self.seen.add(card["code"], "Official Hub", card["odds"])
+                    continue
+                if quota.claim(card["code"]):
+                    codes_found += 1
+                    await asyncio.shield(self.add_booking_code(card["code"], "Official Hub", card["sport"], card["odds"], "1K+ Official", card["posted"]))
+            
+            await self.send_update({
+                "type": "status",
+                "message": f"✓ Official Hub: Found {codes_found} codes",
+                "color": "green"
+            })
+            
+        except Exception as e:
+            await self.send_update({
+                "type": "status",
+                "message": f"Official Hub error: {str(e)}",
+                "color": "red"
+            })
         
         return codes_found
 
-    async def scrape_twitter(self, sport, target_min_odds, processed_codes, codes_found_so_far):
+    async def scrape_twitter(self, sport, target_min_odds, quota):
         """Scrape from Twitter with 45min filter"""
         await self.send_update({"type": "status", "message": f"🐦 Scraping Twitter (Last 45min)...", "color": "blue"})
         
-        codes_found = codes_found_so_far
-        
-        # Pool of Nitter instances
-        nitter_instances = [
-            "https://nitter.net",
-            "https://nitter.poast.org",
-            "https://nitter.privacydev.net",
-            "https://nitter.unixfox.eu",
-            "https://nitter.1d4.us"
-        ]
+        codes_found = 0
         
         search_query = f"sportybet booking code {sport}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        }
+        fetched = None
+        if not quota.full:
+            with metrics.timer("sportygrab_stage_seconds", stage="nitter_fetch"):
+                fetched = await self.nitter.fetch("/search", params={"f": "tweets", "q": search_query})
         
-        response = None
-        
-        # Try each Nitter instance
-        for instance in nitter_instances:
-            if codes_found >= 10:
-                break
-            
-            try:
-                nitter_url = f"{instance}/search?f=tweets&q={search_query.replace(' ', '%20')}"
-                response = await asyncio.to_thread(
-                    requests.get, nitter_url, headers=headers, timeout=10
-                )
-                
-                if response.status_code == 200:
-                    await self.send_update({
-                        "type": "status",
-                        "message": f"✓ Connected to {instance}",
-                        "color": "green"
-                    })
-                    break
-            except:
-                continue
-        
-        if not response or response.status_code != 200:
+        if not fetched:
             await self.send_update({
                 "type": "status",
                 "message": "Twitter: All Nitter instances failed",
@@ -284,82 +1914,50 @@ class SportybetScraper:
             })
             return codes_found
         
+        instance, html = fetched
+        await self.send_update({
+            "type": "status",
+            "message": f"✓ Connected to {instance}",
+            "color": "green"
+        })
+        
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            tweets = soup.find_all('div', class_='timeline-item')
+            # The whole timeline is parsed once into columns; the recency and odds filters run over whole arrays
+            with metrics.timer("sportygrab_stage_seconds", stage="html_parse"):
+                titles, texts = parse_nitter_timeline(html, limit=50)
+                timeline = pd.DataFrame({"posted": parse_nitter_dates(titles), "text": texts})
             
-            if not tweets:
-                tweets = soup.find_all('div', class_='tweet-content')
+            # Apply 45-minute filter; tweets without a readable date are kept
+            age = pd.Timestamp.now(tz="UTC") - timeline["posted"]
+            timeline = timeline[timeline["posted"].isna() | (age <= TWEET_MAX_AGE)]
             
-            for tweet in tweets[:50]:
-                if codes_found >= 10:
+            with metrics.timer("sportygrab_stage_seconds", stage="regex_parse"):
+                rows = [
+                    (code, current_odds)
+                    for text in timeline["text"]
+                    for code, _, current_odds in self.extractor.extract(text, skip=self.seen)
+                ]
+            candidates = pd.DataFrame(rows, columns=["code", "odds"]).astype({"odds": float})
+            
+            # Missing odds are NaN, which never passes the comparison
+            accepted = candidates["odds"].to_numpy() >= target_min_odds
+            rejected = int((~accepted).sum())
+            if rejected:
+                metrics.inc("sportygrab_codes_rejected_total", rejected, source="Twitter (45min)", reason="odds")
+            # Codes known to be too low are not worth parsing again until the TTL runs out
+            for code, current_odds in candidates[~accepted & candidates["odds"].notna().to_numpy()].itertuples(index=False):
+                self.seen.add(code, "Twitter (45min)", float(current_odds))
+            
+            for code, current_odds in candidates[accepted].itertuples(index=False):
+                if quota.full:
                     break
-                
-                try:
-                    # Check timestamp
-                    time_elem = tweet.find('span', class_='tweet-date')
-                    if not time_elem:
-                        time_elem = tweet.find('a', class_='tweet-link')
-                    
-                    tweet_time_str = time_elem.get('title', '') if time_elem else ''
-                    
-                    # Apply 45-minute filter
-                    if tweet_time_str and not self.is_recent(tweet_time_str):
-                        continue
-                    
-                    # Get tweet text
-                    content_elem = tweet.find('div', class_='tweet-content')
-                    if not content_elem:
-                        content_elem = tweet
-                    
-                    text = content_elem.get_text()
-                    codes = self.extract_6char_codes(text)
-                    
-                    for code in codes:
-                        if code in processed_codes or codes_found >= 10:
-                            continue
-                        
-                        # Extract odds
-                        odds_patterns = [
-                            r'odds?:\s*([\d,]+\.?\d*)',
-                            r'([\d,]+\.?\d*)\s*odds?',
-                            r'@\s*([\d,]+\.?\d*)',
-                            r'([\d,]+\.?\d*)[xX]',
-                        ]
-                        
-                        current_odds = None
-                        for pattern in odds_patterns:
-                            odds_match = re.search(pattern, text, re.IGNORECASE)
-                            if odds_match:
-                                try:
-                                    odds_str = odds_match.group(1).replace(',', '')
-                                    current_odds = float(odds_str)
-                                    break
-                                except:
-                                    continue
-                        
-                        if current_odds and current_odds >= target_min_odds:
-                            processed_codes.add(code)
-                            codes_found += 1
-                            
-                            res = {
-                                "code": code,
-                                "source": "Twitter (45min)",
-                                "sport": sport.capitalize(),
-                                "odds": current_odds,
-                                "status": "1K+ Recent",
-                                "timestamp": datetime.now().strftime("%H:%M:%S")
-                            }
-                            self.booking_codes.append(res)
-                            await self.send_update({"type": "booking_code", "data": res})
-                            await asyncio.sleep(0.2)
-                
-                except Exception as e:
-                    continue
+                if quota.claim(code):
+                    codes_found += 1
+                    await asyncio.shield(self.add_booking_code(code, "Twitter (45min)", sport, float(current_odds), "1K+ Recent"))
             
             await self.send_update({
                 "type": "status",
-                "message": f"✓ Twitter: Found {codes_found - codes_found_so_far} codes",
+                "message": f"✓ Twitter: Found {codes_found} codes",
                 "color": "green"
             })
         
@@ -372,7 +1970,7 @@ class SportybetScraper:
         
         return codes_found
 
-    async def scrape_booking_codes(self, sport, target_min_odds=1000):
+    async def scrape_booking_codes(self, sport, target_min_odds=1000, target_codes=10, deadline=120):
         """Hybrid scraper - Both Official Hub + Twitter (45min filter)"""
         await self.send_update({
             "type": "status",
@@ -380,22 +1978,12 @@ class SportybetScraper:
             "color": "blue"
         })
         
-        processed_codes = set()
-        codes_found = 0
-        
-        # Run both scrapers in parallel
-        official_task = asyncio.create_task(
-            self.scrape_official_hub(sport, target_min_odds, processed_codes, codes_found)
-        )
-        twitter_task = asyncio.create_task(
-            self.scrape_twitter(sport, target_min_odds, processed_codes, 0)
-        )
-        
-        # Wait for both to complete
-        results = await asyncio.gather(official_task, twitter_task, return_exceptions=True)
+        # Every source shares one quota; whatever is still running when it fills (or at the deadline) is cancelled
+        quota = Quota(target_codes)
+        await fan_out([source(sport, target_min_odds, quota) for source in self.code_sources], quota, timeout=deadline)
+        await self.seen.save()
         
-        # Count total codes from both sources
-        total_codes = len(processed_codes)
+        total_codes = quota.taken
         
         if total_codes == 0:
             await self.send_update({
@@ -410,7 +1998,128 @@ class SportybetScraper:
                 "color": "green"
             })
 
-scraper = SportybetScraper()
+# Scrape jobs by source name, shared by the in-process scheduler and the worker processes
+SCRAPE_JOBS = {
+    "football": lambda scraper: scraper.scrape_football(),
+    "basketball": lambda scraper: scraper.scrape_basketball(),
+    "booking-codes": lambda scraper, sport: scraper.scrape_booking_codes(sport, 1000),
+}
+
+
+def worker_main(conn, options):
+    """Worker process entry point: runs one scrape job at a time on its own event loop and browser"""
+    # Ctrl+C reaches the whole process group; the API process shuts workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(worker_loop(conn, options))
+
+
+async def worker_loop(conn, options):
+    relay = WorkerRelay(conn)
+    pool = BrowserPool(**options["pool"])
+    # Synced from the API process with each job; only the API process writes the seen-code file
+    seen = SeenCodeCache(**options["seen"])
+    scraper = SportybetScraper(
+        pool,
+        store=relay,
+        broadcaster=relay,
+        api=SportybetApi() if options["fast_path"] else None,
+        seen=seen,
+        snapshots=relay,
+        live_buffer_size=1,
+    )
+    try:
+        while True:
+            try:
+                job = await asyncio.to_thread(conn.recv)
+            except EOFError:
+                break  # The API process is gone
+            if job is None:
+                break
+            job_id, source, params, known = job
+            relay.job_id = job_id
+            seen.update(known)
+            started = time.time()
+            error = None
+            try:
+                await SCRAPE_JOBS[source](scraper, **params)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            # Codes this job reported or rejected, so the next job (on any worker) skips them too
+            relay.send("seen", seen.export(since=started))
+            relay.send("metrics", metrics.drain())
+            relay.send("pool", pool.snapshot())
+            relay.send("done", error)
+    finally:
+        await scraper.nitter.close()
+        if scraper.api:
+            await scraper.api.close()
+        await pool.close()
+
+
+def env_seconds(name):
+    return float(os.environ.get(name, "0") or 0)
+
+broadcaster = Broadcaster(
+    queue_size=int(os.environ.get("WS_QUEUE_SIZE", "256")),
+    policy=os.environ.get("WS_SLOW_CLIENT_POLICY", "drop_oldest"),
+    replay_size=int(os.environ.get("WS_REPLAY_SIZE", "1000")),
+    batch_window=int(os.environ.get("WS_BATCH_WINDOW_MS", "50")) / 1000,
+)
+pool_options = {
+    "max_contexts": int(os.environ.get("BROWSER_POOL_CONTEXTS", "4")),
+    "max_pages_per_context": int(os.environ.get("BROWSER_POOL_PAGES_PER_CONTEXT", "25")),
+    "block_resources": os.environ.get("BLOCK_RESOURCES", "1") != "0",
+}
+fast_path = os.environ.get("FAST_PATH", "1") != "0"
+browser_pool = BrowserPool(**pool_options)
+store = SQLiteStore(os.environ.get("SPORTYGRAB_DB", "sportygrab.db"))
+seen_options = {
+    "ttl": float(os.environ.get("SEEN_CODES_TTL_SECONDS", "2700")),
+    "max_entries": int(os.environ.get("SEEN_CODES_MAX", "10000")),
+}
+seen_path = os.environ.get("SEEN_CODES_PATH") or None
+scraper = SportybetScraper(
+    browser_pool,
+    store=store,
+    broadcaster=broadcaster,
+    api=SportybetApi() if fast_path else None,
+    seen=SeenCodeCache(**seen_options, path=seen_path),
+    live_buffer_size=int(os.environ.get("LIVE_BUFFER_SIZE", "500")),
+)
+# With WORKER_PROCESSES > 0 scrapes run in separate processes and this one only schedules and broadcasts
+worker_processes = int(os.environ.get("WORKER_PROCESSES", "0"))
+worker_tier = None
+if worker_processes > 0:
+    worker_tier = WorkerTier(worker_processes, {"pool": pool_options, "fast_path": fast_path, "seen": seen_options}, scraper)
+    sources = {name: functools.partial(worker_tier.run, name) for name in SCRAPE_JOBS}
+else:
+    sources = {name: functools.partial(job, scraper) for name, job in SCRAPE_JOBS.items()}
+scheduler = Scheduler(sources, concurrency=int(os.environ.get("SCHEDULER_CONCURRENCY", str(max(2, worker_processes)))))
+
+metrics.gauge("sportygrab_ws_clients", lambda: len(broadcaster.clients), "Connected WebSocket clients")
+metrics.gauge("sportygrab_ws_queue_depth", lambda: sum(c["queue"].qsize() for c in broadcaster.clients.values()),
+              "Messages waiting in WebSocket client queues")
+metrics.gauge("sportygrab_seen_codes", lambda: len(scraper.seen.entries), "Booking codes in the seen-code cache")
+metrics.gauge("sportygrab_jobs_in_flight", lambda: len(scheduler._tasks), "Queued or running scrape jobs")
+if worker_tier:
+    metrics.gauge("sportygrab_workers_alive", lambda: worker_tier.snapshot()["alive"], "Live scrape worker processes")
+if worker_tier:
+    # Worker pools report after each job, so only their (long-lived) browsers are tracked here
+    metrics.gauge("sportygrab_browsers_open", lambda: sum(pool["browser_connected"] for pool in worker_tier.pools.values()),
+                  "Connected Chromium instances")
+else:
+    metrics.gauge("sportygrab_browsers_open", lambda: int(bool(browser_pool._browser and browser_pool._browser.is_connected())),
+                  "Connected Chromium instances")
+    metrics.gauge("sportygrab_browser_contexts_busy", lambda: browser_pool._busy, "Browser contexts lent out to scrape jobs")
+
+# Periodic scrapes are off unless an interval (seconds) is configured
+if env_seconds("SCHEDULE_FOOTBALL_SECONDS") > 0:
+    scheduler.every("football", env_seconds("SCHEDULE_FOOTBALL_SECONDS"))
+if env_seconds("SCHEDULE_BASKETBALL_SECONDS") > 0:
+    scheduler.every("basketball", env_seconds("SCHEDULE_BASKETBALL_SECONDS"))
+if env_seconds("SCHEDULE_BOOKING_CODES_SECONDS") > 0:
+    for sport in ("basketball", "football"):
+        scheduler.every("booking-codes", env_seconds("SCHEDULE_BOOKING_CODES_SECONDS"), sport=sport)
 
 @app.get("/", response_class=HTMLResponse)
 async def get_dashboard():
@@ -453,22 +2162,41 @@ async def get_dashboard():
     </div>
     <script>
         let ws;
+        let lastSeq = null;
         function connect() {
-            ws = new WebSocket(`ws://${window.location.host}/ws`);
+            const since = lastSeq === null ? '' : `&since=${lastSeq}`;
+            ws = new WebSocket(`ws://${window.location.host}/ws?mode=batch${since}`);
             ws.onmessage = (e) => {
-                const msg = JSON.parse(e.data);
-                if (msg.type === 'status') addLog(msg.message, msg.color);
-                if (msg.type === 'result') addResult(msg.data);
-                if (msg.type === 'booking_code') addBookingCode(msg.data);
+                const frame = JSON.parse(e.data);
+                for (const msg of (frame.type === 'batch' ? frame.events : [frame])) handle(msg);
             };
+            ws.onclose = () => setTimeout(connect, 1000);
+        }
+        function handle(msg) {
+            if (msg.seq !== undefined) {
+                if (lastSeq !== null && msg.seq <= lastSeq) return;
+                lastSeq = msg.seq;
+            }
+            if (msg.type === 'status') addLog(msg.message, msg.color);
+            if (msg.type === 'gap') addLog('Some updates were missed while disconnected', 'yellow');
+            if (msg.type === 'result') addResult(msg.data, msg.event || 'added');
+            if (msg.type === 'booking_code') addBookingCode(msg.data);
         }
         function addLog(m, c) {
             const div = document.getElementById('statusLog');
             div.innerHTML = `<p class="text-${c || 'slate'}-400">[${new Date().toLocaleTimeString()}] ${m}</p>` + div.innerHTML;
         }
-        function addResult(d) {
-            const tb = document.getElementById('resultsTable');
-            tb.innerHTML = `<tr class="border-b border-slate-700"><td class="py-2">${d.match}</td><td class="text-yellow-400">${d.odds_value}</td><td>${d.timestamp}</td></tr>` + tb.innerHTML;
+        function addResult(d, event) {
+            const key = `${d.sport}|${d.match}|${d.market}`;
+            const existing = Array.from(document.querySelectorAll('#resultsTable tr')).find(tr => tr.dataset.key === key);
+            if (existing) existing.remove();
+            if (event === 'removed') return;
+            const odds = event === 'changed' ? `<span class="text-slate-500 line-through">${d.old_odds}</span> ${d.odds_value}` : d.odds_value;
+            const tr = document.createElement('tr');
+            tr.className = 'border-b border-slate-700';
+            tr.dataset.key = key;
+            tr.innerHTML = `<td class="py-2">${d.match}</td><td class="text-yellow-400">${odds}</td><td>${d.timestamp}</td>`;
+            document.getElementById('resultsTable').prepend(tr);
         }
         function addBookingCode(d) {
             const tb = document.getElementById('codesTable');
@@ -483,19 +2211,165 @@ async def get_dashboard():
     """
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept(); active_connections.append(websocket)
+async def websocket_endpoint(websocket: WebSocket, mode: str = "single", since: Optional[int] = None):
+    # mode=batch: sequenced events coalesced into {"type": "batch", "events": [...]} frames
+    await websocket.accept(); broadcaster.connect(websocket, batch=(mode == "batch"), since=since)
     try:
         while True: await websocket.receive_text()
-    except: active_connections.remove(websocket)
+    except Exception:
+        # Covers normal disconnects as well as sockets we closed on eviction
+        pass
+    finally:
+        broadcaster.disconnect(websocket)
+
+@app.get("/ws/stats")
+async def ws_stats(): return broadcaster.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(): return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/pool/stats")
+async def pool_stats():
+    if worker_tier:
+        return {"workers": worker_tier.pools}
+    return browser_pool.snapshot()
+
+@app.get("/nitter/stats")
+async def nitter_stats(): return scraper.nitter.snapshot()
+
+@app.get("/codes/seen/stats")
+async def seen_code_stats(): return scraper.seen.snapshot()
+
+@app.get("/workers/stats")
+async def worker_stats(): return worker_tier.snapshot() if worker_tier else {"processes": 0}
+
+@app.get("/results")
+async def list_results(sport: Optional[str] = None, min_odds: Optional[float] = None,
+                       since_minutes: Optional[float] = None, page: int = 1, page_size: int = 50):
+    page, page_size = max(page, 1), min(max(page_size, 1), 500)
+    items = await store.query_results(sport, min_odds, since_minutes, page_size, (page - 1) * page_size)
+    return {"page": page, "page_size": page_size, "items": items}
+
+@app.get("/booking-codes")
+async def list_booking_codes(sport: Optional[str] = None, code: Optional[str] = None, min_odds: Optional[float] = None,
+                             since_minutes: Optional[float] = None, page: int = 1, page_size: int = 50):
+    page, page_size = max(page, 1), min(max(page_size, 1), 500)
+    items = await store.query_booking_codes(sport, code, min_odds, since_minutes, page_size, (page - 1) * page_size)
+    return {"page": page, "page_size": page_size, "items": items}
+
+EXPORT_COLUMNS = {
+    "results": ["id", "match", "sport", "market", "odds", "odds_value", "outcomes", "created_at"],
+    "booking_codes": ["id", "code", "source", "sport", "odds", "status", "posted", "created_at"],
+}
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def export_values(row):
+    """Row values in EXPORT_COLUMNS order; created_at becomes a naive UTC datetime (Excel has no time zones)"""
+    values = list(row)
+    values[-1] = datetime.fromtimestamp(values[-1], timezone.utc).replace(tzinfo=None) if values[-1] else None
+    return values
+
+async def stream_csv(table, filters):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS[table])
+    async for rows in store.iter_chunks(table, **filters):
+        writer.writerows(export_values(row) for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Nothing matched; still send the header
+        yield buffer.getvalue().encode()
+
+def write_xlsx(table, filters, path):
+    # Write-only mode streams rows to a temp file instead of keeping every cell object in memory
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(table)
+    sheet.append(EXPORT_COLUMNS[table])
+    for rows in store.chunks(table, **filters):
+        for row in rows:
+            sheet.append(export_values(row))
+    workbook.save(path)
+
+def write_parquet(table, filters, path):
+    types = {"id": pa.int64(), "odds": pa.float64(), "created_at": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS[table]])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in store.chunks(table, **filters):
+            columns = list(zip(*rows))
+            columns[-1] = [datetime.fromtimestamp(ts, timezone.utc) if ts else None for ts in columns[-1]]
+            writer.write_batch(pa.record_batch([list(column) for column in columns], schema=schema))
+
+async def stream_file(write, table, filters):
+    """Builds the file on a worker thread, then streams it from disk; zip and Parquet footers need the whole file first"""
+    await store.flush()
+    fd, path = tempfile.mkstemp(suffix=".export")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write, table, filters, path)
+        with open(path, "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, 1 << 16):
+                yield chunk
+    finally:
+        os.unlink(path)
+
+def export_response(table, format, filters, start=None, end=None):
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_MEDIA_TYPES)}")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow (pip install pyarrow)")
+    # Naive datetimes are taken as UTC
+    for key, moment in (("start", start), ("end", end)):
+        if moment is not None:
+            filters[key] = (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
+    if format == "csv":
+        body = stream_csv(table, filters)
+    else:
+        body = stream_file(write_xlsx if format == "xlsx" else write_parquet, table, filters)
+    filename = f"{table.replace('_', '-')}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/export/results")
+async def export_results(format: str = "csv", sport: Optional[str] = None, min_odds: Optional[float] = None,
+                         since_minutes: Optional[float] = None, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    filters = {"sport": sport, "min_odds": min_odds, "since_minutes": since_minutes}
+    return export_response("results", format, filters, start, end)
+
+@app.get("/export/booking-codes")
+async def export_booking_codes(format: str = "csv", sport: Optional[str] = None, code: Optional[str] = None,
+                               min_odds: Optional[float] = None, since_minutes: Optional[float] = None,
+                               start: Optional[datetime] = None, end: Optional[datetime] = None):
+    filters = {"sport": sport, "code": code, "min_odds": min_odds, "since_minutes": since_minutes}
+    return export_response("booking_codes", format, filters, start, end)
+
+def job_response(job, coalesced):
+    return {"status": "coalesced" if coalesced else "started", "job_id": job["id"]}
 
 @app.post("/scrape/football")
-async def s_f(): asyncio.create_task(scraper.scrape_football()); return {"status": "started"}
+async def s_f(): return job_response(*scheduler.submit("football"))
+
+@app.post("/scrape/basketball")
+async def s_b(): return job_response(*scheduler.submit("basketball"))
 
 @app.post("/scrape/booking-codes")
 async def s_bc(sport: str): 
-    asyncio.create_task(scraper.scrape_booking_codes(sport, 1000))
-    return {"status": "started"}
+    return job_response(*scheduler.submit("booking-codes", sport=sport.lower()))
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50): return scheduler.snapshot(limit)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    job = scheduler.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
 
 if __name__ == "__main__":
     import uvicorn